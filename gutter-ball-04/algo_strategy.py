@@ -1,13 +1,21 @@
 import gamelib
 import random
 import math
+import time
 import warnings
 from sys import maxsize
 import json
-import numpy as np
 
 from gutter_attack import GutterAttack
+from attackbase import BoardContext
+from reservations import TileReservations
+from attack_evaluator import AttackEvaluator, prepare_workers
+from board_analysis import BoardAnalysis
+from placement import PlacementOptimizer
+from maze import MazePlanner
+from economy import SaveSpendPlanner, SAVE
 from algo_util import *
+import geometry
 
 """
 Most of the algo code you write will be in this file unless you create new
@@ -23,12 +31,28 @@ Advanced strategy tips:
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
+    #hardcoded layouts, compiled once into geometry tuples.
+    CRITICAL_TURRETS = ((3,12),(24,12),(11,8),(16,8))
+    # wall_rounds = [[[0,13],[3,13]],[[27,13],[24,13]],[[12,10],[16,10]],[[3,13],[11,10]],[[24,13],[16,10]] ] #sloping, smooth wall.
+    WALL_ROUNDS = tuple(geometry.line(start,end) for start,end in 
+        [[[0,13],[3,13]],[[27,13],[23,13]],[[9,9],[18,9]],[[4,12],[8,8]],[[23,12],[19,8]] ]) #jagged wall, with traps.
+    BONUS_TURRETS = ((10,8),(17,8),(12,8),(15,8))
+    CRITICAL_WALLS = geometry.region(geometry.shift(CRITICAL_TURRETS,0,1),[[0,13],[27,13]])
+    SURPLUS_SUPPORTS = (geometry.line([13,7],[14,7]),geometry.line([13,6],[14,6]))
+
     def __init__(self):
         super().__init__()
         seed = random.randrange(maxsize)
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
 
+    def warm_up(self):
+        """
+        Runs before the config arrives: start the rollout workers' fork server, so the
+        evaluator's pool comes up quickly in on_game_start.
+        """
+        prepare_workers()
+
     def on_game_start(self, config):
         """ 
         Read in config and perform any initial setup here 
@@ -52,6 +76,38 @@ class AlgoStrategy(gamelib.AlgoCore):
             GutterAttack(config,GutterAttack.RIGHT,True)
             ]
         self.lastAttack=None 
+        self.context=None
+        self.context_key=None
+        #tiles claimed each turn by the attack, defences and repairs.
+        self.reservations = TileReservations()
+        #spends the SP left after the essential defences, keeping SP_reserve in hand.
+        self.placement = PlacementOptimizer(config)
+        self.SP_reserve = 20
+        #walls lengthening the enemy's paths, at most maze_budget SP of them a turn.
+        #they are never upgraded, so maze_walls keeps them out of the repair pass.
+        self.maze = MazePlanner(config)
+        self.maze_budget = 4
+        self.maze_walls = set()
+        #holds an affordable attack back when a bigger wave a turn or two later is worth more.
+        #a wave's worth grows faster than its MP, as more of it survives the turrets.
+        self.economy = SaveSpendPlanner()
+        self.wave_exponent = 1.5
+        #and holds SP back when one of the save_items best structure buys is worth waiting for.
+        self.save_items = 3
+        #seconds per turn we are willing to spend scoring the attack suite.
+        self.evaluation_budget = 1.0
+        self.evaluator = AttackEvaluator(config, budget=self.evaluation_budget)
+        self.evaluator.start()
+        #plan each turn under a deadline, leaving headroom below the engine's soft time limit.
+        turn_budget = 0.8 * config["timingAndReplay"]["waitTimeBotSoft"] / 1000
+        self.scheduler = gamelib.TurnScheduler(turn_budget)
+        self.scheduler.add_stage('analysis',self.analyse_board,priority=20,estimate=0.2)
+        self.scheduler.add_stage('attacks',self.evaluate_attacks,priority=10,estimate=self.evaluation_budget)
+        #if a turn still runs out of time, at least rebuild the critical turrets.
+        self.watchdog.fallback = ([(TURRET,x,y) for x,y in [[3,12],[24,12],[11,8],[16,8]]],[])
+
+    def on_game_end(self):
+        self.evaluator.shutdown()
 
     def on_turn(self, turn_state):
         """
@@ -65,9 +121,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
-        self.starter_strategy(game_state)
-
-        game_state.submit_turn()
+        self.scheduler.run(game_state,self.fallback_strategy,self.starter_strategy,self.turn_start_time)
 
 
     """
@@ -75,30 +129,91 @@ class AlgoStrategy(gamelib.AlgoCore):
     strategy and can safely be replaced for your custom algo.
     """
 
-    def starter_strategy(self, game_state):
+    def fallback_strategy(self, game_state):
         """
-        
+        Cheap plan submitted when the full strategy fails or runs out of time: essential defences only.
+        """
+        self.reservations.clear()
+        self.build_essential_defences(game_state)
+
+    def precompute(self, action_frame_game_state):
+        """
+        Runs in the background during the action phase, so on_turn starts from a warm analysis.
+        It waits between paths while on_turn runs.
+        """
+        game_state = gamelib.GameState(self.config, action_frame_game_state)
+        game_state.suppress_warnings(True)
+        return BoardAnalysis(game_state,self.background.checkpoint)
+
+    def analyse_board(self, game_state, results, deadline):
+        """
+        Scheduler stage: the precomputed board analysis patched to this turn's board, or a fresh one.
         """
+        analysis = self.precomputed
+        if(analysis is None):
+            return BoardAnalysis(game_state)
+        return analysis.update(game_state)
 
-        #check for possible attacks: 
-        possibilities = [attack.attackPossible(game_state) for attack in self.attackSuite]
-        possibilities = [pos for pos in possibilities if pos[0]]
-        #TODO: smarter decision making code about whether the attack is a good idea. 
-        #for now, just take a random one, with a bias against the last one. 
+    def evaluate_attacks(self, game_state, results, deadline):
+        """
+        Scheduler stage: finds the feasible attacks and scores them within the time left.
+        """
+        context = self.board_context(game_state)
+        possibilities = [attack for attack in self.attackSuite if attack.attackPossible(game_state,context)[0]]
+        budget = min(self.evaluation_budget, deadline - time.perf_counter())
+        return (possibilities, self.evaluator.evaluate(game_state,possibilities,budget))
+
+    def board_context(self, game_state):
+        """
+        This turn's BoardContext, so the attack suite only looks at the board once.
+        A new one is made whenever the board or resources change, e.g. after spawning.
+        """
+        key = game_state.state_key()
+        if(self.context is None or self.context.game_state is not game_state or self.context_key != key):
+            self.context = BoardContext(game_state)
+            self.context_key = key
+        return self.context
+
+    def starter_strategy(self, game_state, results=None):
+        """
+        
+        """
+        results = results or {}
+
+        #check for possible attacks, using the scored ones if the scheduler had time for them: 
+        if('attacks' in results):
+            possibilities, scores = results['attacks']
+        else:
+            possibilities = [attack for attack in self.attackSuite if attack.attackPossible(game_state,self.board_context(game_state))[0]]
+            scores = None
         self.attacking = False  
         if(len(possibilities)>0):
-            attack_index = random.randint(0,len(possibilities)-1)
-            attack_choice = self.attackSuite[attack_index]
-            if(attack_choice is self.lastAttack):
-                #draw one more time, to encourage a different attack. 
-                attack_index = random.randint(0,len(possibilities)-1)
-                attack_choice = self.attackSuite[attack_index]
-            self.attacking = True 
-            self.lastAttack=attack_choice
+            if(scores is not None):
+                #take the attack that did best in the rollouts.
+                attack_choice = possibilities[scores.index(max(scores))]
+                gamelib.debug_write('Attack scores: {}'.format(scores))
+            else:
+                #no estimate in time, so just take a random one, with a bias against the last one. 
+                attack_choice = random.choice(possibilities)
+                if(attack_choice is self.lastAttack):
+                    #draw one more time, to encourage a different attack. 
+                    attack_choice = random.choice(possibilities)
+            #the rollouts ran attackPossible on copies of the board, so refresh the chosen attack's state.
+            _, _, MPcost = attack_choice.attackPossible(game_state,self.board_context(game_state))
+            attack_now, plan = self.economy.plan_attack(game_state,
+                lambda held: held**self.wave_exponent if held >= MPcost else 0)
+            if(attack_now):
+                self.attacking = True 
+                self.lastAttack=attack_choice
+            else:
+                gamelib.debug_write('Saving MP for a bigger wave: {}'.format(plan))
         
-        self.reserved_tiles = []
+        self.reservations.clear()
+        #our maze walls still standing.
+        self.maze_walls = set(loc for loc in self.maze_walls if self.is_own_wall(game_state,loc))
+        self.reservations.claim('maze',self.maze_walls)
         if(self.attacking):
-            self.reserved_tiles = attack_choice.reservedSquares()
+            self.reservations.claim('attack',attack_choice.reservedSquares())
             attack_choice.spawnAttack(game_state) 
 
         #now, build the great wall of defences. 
@@ -106,20 +221,51 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.build_essential_defences(game_state)
         self.repair_simple_defences(game_state)
 
-        #do we have too much money left over? 
-        iter = 0
-        while(game_state.get_resource(SP) > 20):
-            #maybe perform some random upgrades or spam down more buffs or more turrets? 
-            iter+=1
-            total = 0
-            total += self.build(game_state,build_diagonal([13,7],[14,7]),SUPPORT,True)
-            total += self.build(game_state,build_diagonal([13,6],[14,6]),SUPPORT,True)
-            if(total==0 or iter > 10):
-                break
-
-    def build(self,game_state,locs,unit,upgrade = False):
-        #now, attempt to build: 
-        filtered_locs = [loc for loc in locs if (not loc in self.reserved_tiles)]
+        #make the enemy walk further under our turrets.
+        #the attacks' paths are kept clear of walls and surplus structures for the turns to come,
+        #not just for this one.
+        self.reservations.claim('attack paths',[loc for attack in self.attackSuite for loc in attack.reservedSquares()])
+        walls = self.maze.plan(game_state,min(self.maze_budget,game_state.get_resource(SP)-self.SP_reserve),self.reservations)
+        self.reservations.claim('maze',walls)
+        if(self.maze.apply(game_state,walls) > 0):
+            self.maze_walls.update(tuple(loc) for loc in walls if self.is_own_wall(game_state,loc))
+
+        #do we have too much money left over? spend it on turrets covering the enemy's paths, or more supports.
+        self.spend_surplus(game_state,results.get('analysis'))
+        self.reservations.release('attack paths')
+
+    def spend_surplus(self, game_state, analysis=None):
+        """
+        Spends the SP above SP_reserve on the placement optimizer's picks, unless the economy
+        planner would rather save up for some of the best few. Returns how many builds succeeded.
+        """
+        budget = game_state.get_resource(SP) - self.SP_reserve
+        if(budget <= 0):
+            return 0
+        paths = analysis.enemy_paths if analysis else None
+        sites = geometry.region(*AlgoStrategy.SURPLUS_SUPPORTS)
+        #the best few buys the coming turns' SP could make, and whether to save up for some of them.
+        reach = game_state.project_resources(self.economy.horizon)[0][-1][SP] - self.SP_reserve
+        purchases = self.placement.purchases(game_state,reach,paths,self.reservations,sites)[:self.save_items]
+        items = [(str(i),cost,value) for i,(cost,value,_) in enumerate(purchases)]
+        spend, economy_plan = self.economy.plan_structures(game_state,items,reserve=self.SP_reserve)
+        #a plan to save buys none of them now.
+        chosen = set(economy_plan[0][0].split('+')) - set([SAVE])
+        if(chosen == set(name for name,_,_ in items)):
+            #nothing worth waiting for, so spend the lot.
+            plan = self.placement.plan(game_state,budget,paths,self.reservations,sites)
+        else:
+            gamelib.debug_write('Saving SP for better structures: {}'.format(economy_plan))
+            plan = [step for i,(_,_,actions) in enumerate(purchases) if str(i) in chosen for step in actions]
+        return self.placement.apply(game_state,plan)
+
+    def is_own_wall(self,game_state,loc):
+        unit = game_state.contains_stationary_unit(list(loc))
+        return unit is not False and unit.player_index == 0 and unit.unit_type == WALL
+
+    def build(self,game_state,locs,unit,upgrade = False,owner = 'defence'):
+        #now, attempt to build, leaving alone the tiles someone else has claimed: 
+        filtered_locs = self.reservations.available(locs,owner)
         total = game_state.attempt_spawn(unit,filtered_locs)
         if(upgrade):
             total+=game_state.attempt_upgrade(filtered_locs)
@@ -134,28 +280,20 @@ class AlgoStrategy(gamelib.AlgoCore):
         # More community tools available at: https://terminal.c1games.com/rules#Download
 
         # Place turrets that attack enemy units
-        critical_turrets = [[3,12],[24,12],[11,8],[16,8]]
-        self.build(game_state,critical_turrets,TURRET,True)        
+        self.build(game_state,AlgoStrategy.CRITICAL_TURRETS,TURRET,True)        
 
         #build walls in order of priority: 
-        # wall_rounds = [[[0,13],[3,13]],[[27,13],[24,13]],[[12,10],[16,10]],[[3,13],[11,10]],[[24,13],[16,10]] ] #sloping, smooth wall.
-        wall_rounds = [[[0,13],[3,13]],[[27,13],[23,13]],[[9,9],[18,9]],[[4,12],[8,8]],[[23,12],[19,8]] ] #jagged wall, with traps.
-        for round in wall_rounds:
-            locs = build_diagonal(round[0],round[1])
+        for locs in AlgoStrategy.WALL_ROUNDS:
             self.build(game_state,locs,WALL)
 
         #get a few extra turrets: 
-        bonus_turrets = [[10,8],[17,8],[12,8],[15,8]]
-        self.build(game_state,bonus_turrets,TURRET)
+        self.build(game_state,AlgoStrategy.BONUS_TURRETS,TURRET)
 
         #walls worth upgrading.
-        critical_walls = [[pair[0],pair[1]+1] for pair in critical_turrets]+\
-            [[0,13],[27,13]]
-        game_state.attempt_upgrade(critical_walls)
+        game_state.attempt_upgrade(AlgoStrategy.CRITICAL_WALLS)
 
         #upgrade the extra turrets: 
-        bonus_turrets = [[10,8],[17,8],[12,8],[15,8]]
-        self.build(game_state,bonus_turrets,TURRET,True)
+        self.build(game_state,AlgoStrategy.BONUS_TURRETS,TURRET,True)
 
     def build_support_structures(self, game_state):
         """
@@ -185,23 +323,19 @@ class AlgoStrategy(gamelib.AlgoCore):
     def repair_simple_defences(self,game_state):
         """
         Re-build all up-upgraded units.
+        Tiles being removed are claimed for 'repair', so nothing upgrades them this turn.
         """
         gs = game_state
-        for y in range(0,gs.HALF_ARENA):
-            for x in range(gs.HALF_ARENA-1-y,gs.HALF_ARENA+y+1):
-                loc = [x,y]
-                unit = gs.contains_stationary_unit(loc)
-                if(unit is False):
-                    continue 
-                if(unit.upgraded):
-                    if(unit.health > unit.max_health*.9):
-                        continue 
-                # if(unit.unit_type == SUPPORT):
-                #     continue 
-                gs.attempt_remove([x,y])
-                # print(unit)
-                # elif(unit.stationary and (not unit.upgraded)):
-                #     gs.attempt_remove([x,y])
+        removed = []
+        for unit in gs.get_structures_to_repair(.9):
+            loc = [unit.x,unit.y]
+            if(self.reservations.reserved(loc,'repair')):
+                continue 
+            # if(unit.unit_type == SUPPORT):
+            #     continue 
+            if(gs.attempt_remove(loc)):
+                removed.append(loc)
+        self.reservations.claim('repair',removed)
 
     # def build_reactive_defense(self, game_state):
     #     """
@@ -0,0 +1,181 @@
+import os
+import random
+import time
+import multiprocessing
+import concurrent.futures as futures
+
+import gamelib
+
+"""
+Scores the attack suite by Monte Carlo rollouts of the batched simulator,
+spread over a process pool that lives for the whole game.
+
+Each rollout perturbs the current board with a guess at the enemy's response
+(rebuilt turrets along their front, interceptors from their edges) and simulates
+every candidate attack on it in one batch.
+"""
+
+_worker_config = None
+
+# The simulator needs numpy, which is slow to import and only ever used in the workers,
+# so the algo process never imports it. The workers get it preloaded from the fork server.
+WORKER_PRELOAD = ["gamelib.simulation"]
+
+
+def _context():
+    # Plain fork would copy the stdin reader thread's lock mid-readline, and the workers
+    # deadlock closing stdin on startup, so fork them from a clean server process instead
+    if("forkserver" not in multiprocessing.get_all_start_methods()):
+        return multiprocessing.get_context()
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(WORKER_PRELOAD)
+    return context
+
+
+def prepare_workers():
+    """
+    Starts the fork server the pool's workers are forked from, with numpy and the simulator
+    already imported. It needs no config, so AlgoStrategy.warm_up calls it before the config arrives.
+    """
+    if("forkserver" in multiprocessing.get_all_start_methods()):
+        _context()
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+
+def _init_worker(config):
+    global _worker_config
+    _worker_config = config
+
+
+def _warm_up(_):
+    #touching the config and the simulator here pays for imports and allocation before the first real turn.
+    from gamelib.simulation import BatchSimulator
+    state = _empty_state(_worker_config)
+    BatchSimulator(state).simulate([[]], max_frames=1)
+    return True
+
+
+def _empty_state(config):
+    turn = '{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,0.0,0.0,0],' +\
+        '"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,0.0,0.0,0],"events":{}}'
+    state = gamelib.GameState(config, turn)
+    state.suppress_warnings(True)
+    return state
+
+
+def _enemy_response(game_state, rng):
+    """
+    Guesses the enemy's reply: some of their SP goes into turrets just behind their front line,
+    some of their MP goes into interceptors from random edge tiles. Returns the interceptor spawns.
+    """
+    config = game_state.config
+    turret = config["unitInformation"][2]["shorthand"]
+    interceptor = config["unitInformation"][5]["shorthand"]
+    gm = game_state.game_map
+
+    sp = game_state.get_resource(game_state.SP, 1) * rng.random()
+    turret_cost = game_state.type_cost(turret)[game_state.SP]
+    front = [[x, y] for y in range(14, 17) for x in range(y - 14, 42 - y)]
+    rng.shuffle(front)
+    for loc in front:
+        if sp < turret_cost:
+            break
+        if game_state.contains_stationary_unit(loc) is False:
+            gm.add_unit(turret, loc, 1)
+            sp -= turret_cost
+
+    mp = game_state.get_resource(game_state.MP, 1) * rng.random()
+    interceptor_cost = game_state.type_cost(interceptor)[game_state.MP]
+    edges = gm.get_edge_locations(gm.TOP_LEFT) + gm.get_edge_locations(gm.TOP_RIGHT)
+    edges = [loc for loc in edges if game_state.contains_stationary_unit(loc) is False]
+    spawns = []
+    while(len(edges) > 0 and interceptor_cost > 0 and mp >= interceptor_cost):
+        spawns.append((interceptor, rng.choice(edges), 1))
+        mp -= interceptor_cost
+    return spawns
+
+
+def _rollout(serialized_string, candidates, seed, deadline=None):
+    #a queued rollout the caller has stopped waiting for returns None without simulating.
+    #deadline is time.time(), as perf_counter is not comparable across processes.
+    if(deadline is not None and time.time() > deadline):
+        return None
+    from gamelib.simulation import BatchSimulator
+    rng = random.Random(seed)
+    game_state = gamelib.GameState(_worker_config, serialized_string)
+    game_state.suppress_warnings(True)
+    interceptors = _enemy_response(game_state, rng)
+    return [float(score) for score in BatchSimulator(game_state).simulate(candidates, opponent=interceptors).score()]
+
+
+def attack_candidate(config, serialized_string, attack):
+    """
+    The units attack.spawnAttack would place this turn, as a BatchSimulator candidate.
+    Computed on a throwaway GameState, so the real one is left untouched.
+    """
+    remove = config["unitInformation"][6]["shorthand"]
+    gs = gamelib.GameState(config, serialized_string)
+    gs.suppress_warnings(True)
+    attack.attackPossible(gs)
+    attack.spawnAttack(gs)
+    return [(unit_type, [x, y], 1) for unit_type, x, y in gs._build_stack + gs._deploy_stack if unit_type != remove]
+
+
+class AttackEvaluator(object):
+    """
+    Monte Carlo scoring of candidate attacks over a persistent process pool.
+    Call start() once (at on_game_start), evaluate() every turn and shutdown() at the end.
+    A rollout already running when evaluate() times out cannot be stopped, so by default
+    the pool leaves one CPU free for the algo's own process.
+    """
+    def __init__(self, config, budget=1.0, rollouts=16, workers=None):
+        self.config = config
+        self.budget = budget
+        self.rollouts = rollouts
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.pool = None
+
+    def start(self):
+        """
+        Spins up the worker processes and waits for each to warm up.
+        """
+        self.pool = futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=_context(), initializer=_init_worker, initargs=(self.config,))
+        list(self.pool.map(_warm_up, range(self.workers)))
+
+    def shutdown(self):
+        if(self.pool is not None):
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    def evaluate(self, game_state, attacks, budget=None):
+        """
+        Returns the mean rollout score of each attack (higher is better), or None if no rollout
+        finished inside the budget (in seconds). Unfinished rollouts are cancelled, and any the
+        workers pick up after the deadline return at once, so on timeout the result is the best
+        estimate so far and the workers are free again within one rollout.
+        """
+        if(self.pool is None or len(attacks) == 0):
+            return None
+        deadline = time.perf_counter() + (self.budget if budget is None else budget)
+        serialized = game_state.serialized_string
+        candidates = [attack_candidate(self.config, serialized, attack) for attack in attacks]
+        worker_deadline = time.time() + max(0, deadline - time.perf_counter())
+        pending = [self.pool.submit(_rollout, serialized, candidates, random.randrange(2**31), worker_deadline) for _ in range(self.rollouts)]
+
+        totals = [0.0]*len(attacks)
+        finished = 0
+        try:
+            for future in futures.as_completed(pending, timeout=max(0, deadline - time.perf_counter())):
+                scores = future.result()
+                if(scores is None):
+                    continue
+                totals = [total + score for total, score in zip(totals, scores)]
+                finished += 1
+        except futures.TimeoutError:
+            gamelib.debug_write('Attack evaluation ran out of budget after {} of {} rollouts'.format(finished, self.rollouts))
+        for future in pending:
+            future.cancel()
+        if(finished == 0):
+            return None
+        return [total / finished for total in totals]
@@ -1,13 +1,53 @@
 
+class BoardContext(object):
+    """
+    Per-turn facts about the board, worked out once and shared by every attack in the suite.
+    Occupancy and upgrades are board masks (bit x+28*y), costs and anything an attack stores
+    with memo() are computed the first time they are asked for. The board must not change
+    while the context is in use, so make a new one after spawning anything.
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.structures = game_state.game_map.structure_mask()
+        self.upgraded = game_state.game_map.upgraded_mask()
+        self.SP = game_state.get_resource(game_state.SP)
+        self.MP = game_state.get_resource(game_state.MP)
+        self._costs = {}
+        self._memo = {}
+
+    def blocked(self, mask):
+        #does any structure sit on these tiles?
+        return (self.structures & mask) != 0
+
+    def empty(self, mask):
+        return mask & ~self.structures
+
+    def unupgraded(self, mask):
+        #tiles with a structure that is not upgraded yet.
+        return mask & self.structures & ~self.upgraded
+
+    def cost(self, unit_type, upgrade=False):
+        key = (unit_type, upgrade)
+        if(key not in self._costs):
+            self._costs[key] = self.game_state.type_cost(unit_type, upgrade)
+        return self._costs[key]
+
+    def memo(self, key, compute):
+        #shares a result between attacks, e.g. the cost of a region several of them build.
+        if(key not in self._memo):
+            self._memo[key] = compute()
+        return self._memo[key]
+
 
 class AttackBase(object):
     def __init__(self,gs):
         self.gs = gs 
         pass 
     
-    def attackPossible(self,game_state):
+    def attackPossible(self,game_state,context=None):
         """
         Should return a tuple (bool,int,int), being (attack possible, attack SP cost, attack MP cost)
+        context is this turn's BoardContext, shared by the whole suite. Make one if it is None.
         """
     
     def reservedSquares(self,game_state):
@@ -19,4 +59,3 @@ class AttackBase(object):
         """
         Builds the units necessary for the attack!
         """
-        
\ No newline at end of file
@@ -0,0 +1,73 @@
+import gamelib
+
+"""
+Board-wide analysis that only depends on the structure layout: where enemy units will
+walk, and how much damage each player's structures deal on every tile. It is cheap to
+patch when only a few structures change, so it can be built from an action frame in the
+background and brought up to date with the real turn state at the start of on_turn.
+The map's Zobrist hash is kept with it, so an unchanged board is spotted without a scan.
+"""
+
+
+def _structures(game_state):
+    structures = {}
+    for location in game_state.game_map:
+        unit = game_state.contains_stationary_unit(location)
+        if unit:
+            structures[(unit.x, unit.y)] = (unit.unit_type, unit.player_index, unit.upgraded, unit.damage_i, unit.attackRange)
+    return structures
+
+
+class BoardAnalysis(object):
+    """
+    enemy_paths: dict of enemy edge tile -> path a unit spawned there would take.
+    damage[player][x][y]: damage per frame player's structures deal to an enemy mobile unit at [x,y].
+    checkpoint, if given, is called before each path is found, e.g. BackgroundWorker.checkpoint.
+    """
+    def __init__(self, game_state, checkpoint=None):
+        arena = game_state.ARENA_SIZE
+        self.damage = [[[0.0]*arena for _ in range(arena)] for player in (0,1)]
+        self.structures = _structures(game_state)
+        self.key = game_state.game_map.zobrist_hash()
+        for location, structure in self.structures.items():
+            self._add_threat(game_state, location, structure, 1)
+        self.enemy_paths = self._enemy_paths(game_state, checkpoint)
+
+    def _add_threat(self, game_state, location, structure, sign):
+        _, player, _, damage, attack_range = structure
+        if(damage <= 0):
+            return
+        for x, y in game_state.game_map.get_locations_in_range(list(location), attack_range):
+            self.damage[player][x][y] += sign * damage
+
+    def _enemy_paths(self, game_state, checkpoint=None):
+        gm = game_state.game_map
+        paths = {}
+        for loc in gm.get_edge_locations(gm.TOP_LEFT) + gm.get_edge_locations(gm.TOP_RIGHT):
+            if(checkpoint is not None):
+                checkpoint()
+            if(game_state.contains_stationary_unit(loc) is False):
+                paths[tuple(loc)] = game_state.find_path_to_edge(loc)
+        return paths
+
+    def update(self, game_state):
+        """
+        Patches the analysis to match game_state: threat only changes around structures that
+        appeared, disappeared or changed, and paths are only recomputed if anything changed.
+        """
+        key = game_state.game_map.zobrist_hash()
+        if(key == self.key):
+            return self
+        self.key = key
+        structures = _structures(game_state)
+        changed = [loc for loc in set(structures) | set(self.structures) if structures.get(loc) != self.structures.get(loc)]
+        if(len(changed) == 0):
+            return self
+        for loc in changed:
+            if(loc in self.structures):
+                self._add_threat(game_state, loc, self.structures[loc], -1)
+            if(loc in structures):
+                self._add_threat(game_state, loc, structures[loc], 1)
+        self.structures = structures
+        self.enemy_paths = self._enemy_paths(game_state)
+        return self
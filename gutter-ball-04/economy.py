@@ -0,0 +1,94 @@
+"""
+When to save and when to spend, planned a few turns ahead with GameState.project_resources.
+
+A resource's future only depends on what is held and what is spent each turn, as income,
+decay and the cap are known in advance, so the best plan is a small dynamic program over
+(turn, amount held). Every turn offers a set of actions, each spending some of the amount
+for some value, and saving is always one of them. Later value is discounted, as the board
+will have changed by then.
+"""
+
+SAVE = 'save'
+
+
+class SaveSpendPlanner(object):
+    """
+    discount is what value a turn later is worth, horizon how many turns to plan.
+    """
+    def __init__(self, discount=0.85, horizon=6):
+        self.discount = discount
+        self.horizon = horizon
+
+    def plan(self, held, gains, actions, decay=0.0, cap=None):
+        """
+        The best actions for each of the next len(gains)+1 turns and their discounted value.
+
+        held is the amount now, gains[t] what arrives before turn t+1 (MP decays first, as in
+        the engine), and actions(amount) lists the (name, spent, value) choices with that amount
+        held. Returns (value, [(name, amount held), ...]), starting with this turn.
+        """
+        best = {}
+
+        def value(turn, amount):
+            key = (turn, amount)
+            if(key not in best):
+                choices = [(SAVE, 0, 0.0)] + list(actions(amount))
+                result = None
+                for name, spent, gained in choices:
+                    if(spent > amount):
+                        continue
+                    later, steps = 0.0, []
+                    if(turn < len(gains)):
+                        following = round((amount - spent) * (1 - decay) + gains[turn], 1)
+                        if(cap is not None):
+                            following = min(following, cap)
+                        later, steps = value(turn + 1, following)
+                    total = gained + self.discount * later
+                    if(result is None or total > result[0]):
+                        result = (total, [(name, amount)] + steps)
+                best[key] = result
+            return best[key]
+
+        return value(0, held)
+
+    def _gains(self, projection, resource, decay):
+        #what arrives each turn, from a projection of holding everything.
+        return [round(projection[t+1][resource] - projection[t][resource] * (1 - decay), 1) for t in range(len(projection) - 1)]
+
+    def plan_attack(self, game_state, attack_value, player_index=0):
+        """
+        Whether to attack with all our MP now or save for a bigger wave.
+
+        attack_value(MP) is what attacking with that much MP is worth, 0 if it is not enough.
+        Returns (attack now, plan) with plan as returned by plan().
+        """
+        resources = game_state.config["resources"]
+        decay = resources["bitDecayPerRound"]
+        projection = game_state.project_resources(self.horizon)[player_index]
+        def actions(amount):
+            worth = attack_value(amount)
+            return [('attack', amount, worth)] if worth > 0 else []
+        gains = self._gains(projection, game_state.MP, decay)
+        _, steps = self.plan(projection[0][game_state.MP], gains, actions, decay, resources.get("maxBits"))
+        return steps[0][0] == 'attack', steps
+
+    def plan_structures(self, game_state, items, player_index=0, reserve=0):
+        """
+        How much SP to spend this turn, when some purchases are worth saving up for.
+
+        items is a list of (name, SP cost, value), e.g. a wall's worth and an upgrade's, each
+        of which can be bought once a turn, and reserve SP is never spent. Returns (SP to spend
+        now, plan) with plan as returned by plan(), whose names are '+' joined purchases.
+        """
+        projection = game_state.project_resources(self.horizon)[player_index]
+        def actions(amount):
+            #every affordable combination of the items, bought at most once each.
+            combos = [('', 0, 0.0)]
+            for name, cost, worth in items:
+                combos += [(combo + '+' + name if combo else name, spent + cost, gained + worth)
+                           for combo, spent, gained in combos if spent + cost <= amount]
+            return combos[1:]
+        _, steps = self.plan(projection[0][game_state.SP] - reserve, self._gains(projection, game_state.SP, 0.0), actions)
+        name, _ = steps[0]
+        spend = sum(cost for item, cost, _ in items if item in name.split('+'))
+        return spend, steps
@@ -16,7 +16,30 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The BatchSimulator class in simulation.py runs a coarse, vectorized action phase for many candidate deployments over one shared board. 
+Investigating it is useful for players comparing several attacks before committing to one. \n
+
+The TurnScheduler class in scheduler.py runs optional analysis stages under a wall-clock deadline and always submits a valid plan. 
+Investigating it is useful for players adding expensive analysis without risking timeouts. \n
+
+The TurnWatchdog class in watchdog.py makes sure a plan is submitted every turn, even if on_turn runs long or crashes. 
+Investigating it is useful for players who want to commit partial plans while they keep improving them. \n
+
+The BackgroundWorker class in background.py runs AlgoCore.precompute on the latest action frame while the algo waits for input. \n
+
+The CommandReader class in reader.py reads engine messages on its own thread and drops stale action frames when the algo falls behind. \n
+
+The ReplayRecorder class in replay.py records all engine traffic to a compact log when ALGO_REPLAY_LOG is set, read_replay() reads it back. \n
+
+The Profiler class in profiling.py times on_turn and the slow GameState functions when ALGO_PROFILE is set, and can cProfile the slowest turns. \n
+
+The MemoryReport class in memory.py logs tracemalloc snapshots of each turn's memory use and growth when ALGO_MEMORY is set. \n
+
+tables.py loads the precomputed board tables in board_tables.json that GameMap looks locations up in. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
+
+debug_log.py contains the buffered, level-gated debug channel behind debug_write(). It is flushed once per turn, set ALGO_DEBUG=1 for immediate output.
 """
 
 from .algocore import AlgoCore
@@ -24,6 +47,7 @@ from .util import debug_write
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .scheduler import TurnScheduler
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "background", "debug_log", "game_state", "game_map", "memory", "navigation", "profiling", "reader", "replay", "scheduler", "simulation", "tables", "unit", "util", "watchdog"]
  
\ No newline at end of file
@@ -1,7 +1,18 @@
 import json
+import os
+import threading
+import time
+import traceback
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .util import get_command, debug_write, BANNER_TEXT, add_command_listener
+from .debug_log import channel
+from .watchdog import TurnWatchdog
+from .background import BackgroundWorker
+from .reader import CommandReader, classify, CONFIG, TURN, ACTION_FRAME, END
+from .replay import ReplayRecorder, INBOUND
+from . import profiling
+from . import memory
 
 class AlgoCore(object):
     """
@@ -10,10 +21,29 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * turn_start_time (float): time.perf_counter() value when the latest turn message arrived
+        * watchdog (:obj: TurnWatchdog): Submits the best committed plan if on_turn runs past watchdog.limit seconds or crashes.
+          The limit defaults to 95% of the engine's soft turn time, set watchdog.limit or watchdog.fallback to change it.
+        * background (:obj: BackgroundWorker): Runs precompute on the latest action frame while the algo waits for input
+        * threaded_input (bool): Read stdin on a CommandReader thread, which drops stale action frames when the algo falls behind
+        * replay_path (str): If set, or if the ALGO_REPLAY_LOG environment variable is, all engine traffic is recorded to this file
+        * profiler (:obj: Profiler): If set, or if the ALGO_PROFILE environment variable is, times on_turn and gamelib's hot paths
+          and logs a summary at game end
+        * memory_report (:obj: MemoryReport): If set, or if the ALGO_MEMORY environment variable is, logs tracemalloc
+          snapshots of each turn's memory use and growth
 
     """
     def __init__(self):
         self.config = None
+        self.turn_start_time = None
+        self.watchdog = TurnWatchdog()
+        self.background = BackgroundWorker(self.precompute, "action-phase-precompute")
+        self.threaded_input = True
+        self.replay_path = None
+        self.profiler = None
+        self.memory_report = None
+        self._recorder = None
+        self._warm_up_thread = None
 
     def on_game_start(self, config):
         """
@@ -31,8 +61,7 @@ class AlgoCore(object):
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
         """
-        send_command("[]")
-        send_command("[]")
+        self.watchdog.submit([], [])
     
     def on_action_frame(self, action_frame_game_state):
         """
@@ -43,6 +72,46 @@ class AlgoCore(object):
         """
         pass
 
+    def precompute(self, action_frame_game_state):
+        """
+        Override this to analyse the board in a background thread during the action phase.
+        It is called with the latest action frame whenever the previous call has finished,
+        so frames that arrive while it is busy are skipped. Its return value from the last frame
+        before a turn is available as self.precomputed during on_turn, and is cleared afterwards.
+        A call still running when a turn arrives only stops at self.background.checkpoint(), so
+        long computations should call it between steps.
+        """
+        return None
+
+    def warm_up(self):
+        """
+        Called once by start() on a background thread right after the banner is printed, while
+        the engine is still getting ready to send the config. Override it to pay for imports,
+        tables and process start-up before the clock matters. There is no config yet, and
+        on_game_start is not called until it has finished.
+        """
+        pass
+
+    def _run_warm_up(self):
+        try:
+            self.warm_up()
+        except Exception:
+            debug_write("warm_up failed:\n{}".format(traceback.format_exc()))
+
+    @property
+    def precomputed(self):
+        """
+        The result of the latest finished precompute call this action phase, or None.
+        """
+        return self.background.result()
+
+    def on_game_end(self):
+        """
+        This function is called once when the game engine sends the end game message,
+        just before the parsing loop stops. Override it to release resources held for the game.
+        """
+        pass
+
 
     def start(self):
         """ 
@@ -52,44 +121,116 @@ class AlgoCore(object):
         The algo continues this loop until it recieves the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        channel.flush()
+        if type(self).warm_up is not AlgoCore.warm_up:
+            self._warm_up_thread = threading.Thread(target=self._run_warm_up, name="warm-up", daemon=True)
+            self._warm_up_thread.start()
+        self.watchdog.activate()
+        record_inbound = None
+        replay_path = self.replay_path or os.environ.get("ALGO_REPLAY_LOG")
+        if replay_path:
+            self._recorder = ReplayRecorder(replay_path)
+            add_command_listener(self._recorder.record_outbound)
+            record_inbound = lambda line: self._recorder.record(INBOUND, line)
+        if self.threaded_input:
+            reader = CommandReader(on_message=record_inbound)
+            reader.start()
 
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
-                    """
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
-                    """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state, game over. Stopping algo.")
-                    break
-                else:
-                    """
-                    Something is wrong? Received an incorrect or improperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+            if self.threaded_input:
+                kind, game_state_string = reader.get()
             else:
-                """
-                Something is wrong? Received an incorrect or improperly formatted string.
-                """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                game_state_string = get_command()
+                kind = classify(game_state_string)
+                if self._recorder:
+                    self._recorder.record(INBOUND, game_state_string)
+            if not self.handle_message(game_state_string, kind):
+                break
+
+    def handle_message(self, game_state_string, kind=None):
+        """
+        Processes one message from the game engine, calling the on_* hook it is meant for.
+        start() calls this for every line read from stdin. It can also be called directly
+        to drive the algo in-process, for example from a replay or a benchmark.
+
+        Args:
+            game_state_string: The message, as the engine sent it
+            kind: What reader.classify() says the message is, worked out here if None
+
+        Returns:
+            False once the end game message has been handled, True otherwise
+        """
+        if kind is None:
+            kind = classify(game_state_string)
+        if kind == CONFIG:
+            """
+            This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+            """
+            parsed_config = json.loads(game_state_string)
+            if self._warm_up_thread is not None:
+                self._warm_up_thread.join()
+                self._warm_up_thread = None
+            if self.profiler is None:
+                self.profiler = profiling.from_environment()
+            if self.profiler:
+                self.profiler.install(self)
+            if self.memory_report is None:
+                self.memory_report = memory.from_environment()
+            if self.memory_report:
+                self.memory_report.start()
+            self.on_game_start(parsed_config)
+            if self.watchdog.limit is None:
+                soft_limit = parsed_config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000)
+                self.watchdog.limit = 0.95 * soft_limit / 1000
+            channel.flush()
+        elif kind == TURN:
+            """
+            This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+            deploy phase. Printing is handled by the provided functions.
+            """
+            self.turn_start_time = time.perf_counter()
+            self.watchdog.start_turn(self.turn_start_time)
+            # A precompute already running carries on until its next checkpoint()
+            self.background.pause()
+            try:
+                self.on_turn(game_state_string)
+            except Exception:
+                debug_write("on_turn failed:\n{}".format(traceback.format_exc()))
+            finally:
+                self.watchdog.finish_turn()
+                self.background.clear()
+                self.background.resume()
+                if self._recorder:
+                    self._recorder.end_turn()
+                if self.memory_report:
+                    self.memory_report.end_turn(channel)
+                channel.flush()
+        elif kind == ACTION_FRAME:
+            """
+            This game_state_string string represents a single frame of an action phase
+            """
+            self.on_action_frame(game_state_string)
+            if type(self).precompute is not AlgoCore.precompute:
+                self.background.submit(game_state_string)
+        elif kind == END:
+            """
+            This is the end game message. This means the game is over so break and finish the program.
+            """
+            debug_write("Got end state, game over. Stopping algo.")
+            self.on_game_end()
+            if self._recorder:
+                self._recorder.close()
+            if self.profiler:
+                self.profiler.finish(channel)
+            if self.memory_report:
+                self.memory_report.finish(channel)
+            channel.flush()
+            return False
+        else:
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string : {}".format(game_state_string))
+        return True
@@ -0,0 +1,100 @@
+import threading
+import traceback
+
+from .util import debug_write
+
+
+class BackgroundWorker:
+    """Runs a function on the most recently submitted item in a background thread.
+
+    Only the newest item matters, so submitting while the worker is busy replaces
+    whatever was waiting instead of queueing it. The worker can be paused while the
+    main thread has time critical work to do, such as planning a turn. Pausing cannot
+    interrupt a running job, so long jobs should call checkpoint() between steps.
+
+    Attributes :
+        * paused (bool): While True no new job starts, and a running job waits at checkpoint()
+
+    """
+    def __init__(self, function, name="background-worker"):
+        """Creates the worker, the thread starts on the first submission
+
+        Args:
+            function: Called as function(item) in the background, its return value becomes result()
+            name: The name of the worker thread
+
+        """
+        self.paused = False
+        self._function = function
+        self._name = name
+        self._condition = threading.Condition()
+        self._pending = None
+        self._has_pending = False
+        self._result = None
+        self._generation = 0
+        self._thread = None
+
+    def submit(self, item):
+        """Hands an item to the worker, replacing any item that has not been started yet
+        """
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._pending = item
+            self._has_pending = True
+            self._condition.notify()
+
+    def pause(self):
+        """Stops new jobs from starting until resume() is called
+
+        A running job carries on until its next checkpoint(), or to the end if it has none.
+        """
+        with self._condition:
+            self.paused = True
+
+    def resume(self):
+        with self._condition:
+            self.paused = False
+            self._condition.notify_all()
+
+    def checkpoint(self):
+        """Called by the running job between steps, waits there while the worker is paused
+        """
+        with self._condition:
+            while self.paused:
+                self._condition.wait()
+
+    def result(self):
+        """The return value of the latest finished job, or None
+        """
+        with self._condition:
+            return self._result
+
+    def clear(self):
+        """Drops the latest result and any item waiting to be started
+        """
+        with self._condition:
+            self._result = None
+            self._pending = None
+            self._has_pending = False
+            self._generation += 1
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self.paused or not self._has_pending:
+                    self._condition.wait()
+                item = self._pending
+                self._pending = None
+                self._has_pending = False
+                generation = self._generation
+            try:
+                result = self._function(item)
+            except Exception:
+                debug_write("Background job failed:\n{}".format(traceback.format_exc()))
+                continue
+            with self._condition:
+                # A clear() while the job ran means the result is already stale
+                if generation == self._generation:
+                    self._result = result
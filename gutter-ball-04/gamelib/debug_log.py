@@ -0,0 +1,103 @@
+import atexit
+import os
+import sys
+import threading
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+
+class DebugChannel:
+    """Buffered, level-gated debug output to the game's debug stream (stderr).
+
+    Messages below the channel's level are discarded before they are formatted, so
+    callers should pass a format string and its arguments rather than a built string.
+    Accepted messages go into a ring buffer that is written out in one go by flush(),
+    which AlgoCore calls once per turn. Each format string may only be logged
+    rate_limit times between flushes, further copies are counted and summarised instead.
+
+    Attributes :
+        * level (int): Messages below this level are discarded, one of DEBUG, INFO, WARNING, ERROR
+        * immediate (bool): Write every message as soon as it is logged, for debugging
+        * rate_limit (int): How often one format string may be logged between flushes, 0 for no limit
+        * overflowed (int): Messages pushed out of the ring buffer before they could be flushed
+
+    """
+    def __init__(self, level=INFO, immediate=False, capacity=1000, rate_limit=10, stream=None):
+        self.level = level
+        self.immediate = immediate
+        self.rate_limit = rate_limit
+        self.overflowed = 0
+        self._stream = stream
+        self._buffer = deque(maxlen=capacity)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def enabled_for(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """Logs a message, formatting it with message.format(*args) only if it will be output
+
+        Args:
+            level: DEBUG, INFO, WARNING or ERROR
+            message: The message, or a format string if args are given
+            args: Arguments for the format string
+
+        """
+        if level < self.level:
+            return
+        with self._lock:
+            count = self._counts.get(message, 0) + 1
+            self._counts[message] = count
+            if self.rate_limit and count > self.rate_limit:
+                return
+            text = str(message).format(*args) if args else str(message)
+            if self.immediate:
+                self._write(text + "\n")
+                return
+            if len(self._buffer) == self._buffer.maxlen:
+                self.overflowed += 1
+            self._buffer.append(text)
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def flush(self):
+        """Writes out everything buffered since the last flush and resets the rate limits
+        """
+        with self._lock:
+            lines = list(self._buffer)
+            self._buffer.clear()
+            if self.overflowed > 0:
+                lines.append("({} debug messages were dropped, the log buffer was full)".format(self.overflowed))
+                self.overflowed = 0
+            for message, count in self._counts.items():
+                if self.rate_limit and count > self.rate_limit:
+                    lines.append("({} more like: {})".format(count - self.rate_limit, str(message).strip()))
+            self._counts = {}
+            if len(lines) > 0:
+                self._write("\n".join(lines) + "\n")
+
+    def _write(self, text):
+        stream = self._stream if self._stream is not None else sys.stderr
+        stream.write(text)
+        stream.flush()
+
+
+# Set ALGO_DEBUG=1 to restore immediate, unfiltered output while developing
+_debug_mode = os.environ.get("ALGO_DEBUG", "") not in ("", "0")
+channel = DebugChannel(level=DEBUG if _debug_mode else INFO, immediate=_debug_mode)
+atexit.register(channel.flush)
@@ -1,6 +1,49 @@
+import functools
 import math
 from .unit import GameUnit
-from .util import debug_write
+from .debug_log import channel
+from . import tables
+
+def location_bit(location):
+    """The bit for a location in a board mask, bit x + 28*y
+
+    """
+    return 1 << (location[0] + 28 * location[1])
+
+def locations_mask(locations):
+    """A board mask with the bits of all the given locations set
+
+    """
+    mask = 0
+    for location in locations:
+        mask |= location_bit(location)
+    return mask
+
+HEALTH_BUCKETS = 4
+
+@functools.lru_cache(maxsize=None)
+def zobrist_key(*feature):
+    """The random 64 bit key a Zobrist hash XORs in for a feature, a tuple of small ints
+
+    Keys come from splitmix64 of the packed feature rather than a stored table, so they are
+    the same in every process and nothing is generated at start-up.
+
+    """
+    packed = 0
+    for part in feature:
+        packed = (packed << 12) | part
+    z = (packed + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+def health_bucket(unit):
+    """Which of HEALTH_BUCKETS equal bands of its max_health a unit's health is in, 0 being the lowest
+
+    """
+    if unit.max_health <= 0:
+        return HEALTH_BUCKETS - 1
+    return max(0, min(HEALTH_BUCKETS - 1, int(HEALTH_BUCKETS * unit.health / unit.max_health)))
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -19,6 +62,16 @@ class GameMap:
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
 
+    Occupancy is also kept as board masks, ints with bit x + 28*y set for each location
+    (see location_bit), so template checks can be done with a few bitwise operations.
+    Each player's structures are indexed by location as well (see structures), so they can be
+    enumerated without scanning the board.
+    The structures also make up a Zobrist hash of the board (see zobrist_hash), covering each
+    structure's type, owner, upgrade and health bucket, for a constant time cache key.
+    All of these are kept up to date by add_unit, remove_unit and assigning to game_map[x, y].
+    Call refresh_location after changing the units at a location any other way, including
+    changing a structure's health.
+
     """
     def __init__(self, config):
         """Initializes constants and game map
@@ -37,6 +90,12 @@ class GameMap:
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
         self.__start = [13,0]
+        self.__structures = [0, 0]
+        self.__upgraded = [0, 0]
+        self.__structure_index = [{}, {}]
+        self.__type_index = dict((unit_info.get("shorthand"), i) for i, unit_info in enumerate(config["unitInformation"]))
+        self.__location_keys = {}
+        self.__hash = 0
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -47,6 +106,7 @@ class GameMap:
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
             self.__map[location[0]][location[1]] = val
+            self.refresh_location(location)
             return
         self._invalid_coordinates(location)
 
@@ -76,7 +136,7 @@ class GameMap:
         return grid
 
     def _invalid_coordinates(self, location):
-        self.warn("{} is out of bounds.".format(str(location)))
+        self.warn("{} is out of bounds.", location)
 
     def in_arena_bounds(self, location):
         """Checks if the given location is inside the diamond shaped game board.
@@ -89,19 +149,7 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        return (x, y) in tables.ARENA_TILES
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -114,7 +162,7 @@ class GameMap:
 
         """
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
-            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
+            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.", quadrant_description)
             return
 
         edges = self.get_edges()
@@ -127,27 +175,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in edge] for edge in tables.EDGES]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -164,7 +192,7 @@ class GameMap:
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
         if player_index < 0 or player_index > 1:
-            self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
+            self.warn("Player index {} is invalid. Player index should be 0 or 1.", player_index)
 
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
@@ -172,6 +200,7 @@ class GameMap:
             self.__map[x][y].append(new_unit)
         else:
             self.__map[x][y] = [new_unit]
+            self.refresh_location(location)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -187,6 +216,82 @@ class GameMap:
         
         x, y = location
         self.__map[x][y] = []
+        self.refresh_location(location)
+
+    def refresh_location(self, location):
+        """Brings the board masks, structure index and hash up to date with the units at a location.
+
+        Args:
+            location: The location whose units were changed
+
+        """
+        x, y = location
+        bit = location_bit(location)
+        for player_index in (0, 1):
+            self.__structures[player_index] &= ~bit
+            self.__upgraded[player_index] &= ~bit
+            self.__structure_index[player_index].pop((x, y), None)
+        self.__hash ^= self.__location_keys.pop((x, y), 0)
+        key = 0
+        for unit in self.__map[x][y]:
+            if unit.stationary and unit.player_index in (0, 1):
+                self.__structures[unit.player_index] |= bit
+                self.__structure_index[unit.player_index][(x, y)] = unit
+                if unit.upgraded:
+                    self.__upgraded[unit.player_index] |= bit
+                key ^= zobrist_key(x + 28 * y, unit.player_index, self.__type_index.get(unit.unit_type, 0),
+                                   int(unit.upgraded), health_bucket(unit))
+        if key:
+            self.__location_keys[(x, y)] = key
+            self.__hash ^= key
+
+    def structure_mask(self, player_index=None):
+        """Gets a board mask of the locations holding structures
+
+        Args:
+            player_index: Only count this player's structures, both players' if None
+
+        Returns:
+            An int with bit x + 28*y set for every location with a structure
+
+        """
+        if player_index is None:
+            return self.__structures[0] | self.__structures[1]
+        return self.__structures[player_index]
+
+    def structures(self, player_index=None):
+        """Gets the structures on the map from the structure index, without scanning the board
+
+        Args:
+            player_index: Only list this player's structures, both players' if None
+
+        Returns:
+            A list of structure units
+
+        """
+        if player_index is None:
+            return list(self.__structure_index[0].values()) + list(self.__structure_index[1].values())
+        return list(self.__structure_index[player_index].values())
+
+    def upgraded_mask(self, player_index=None):
+        """Gets a board mask of the locations holding upgraded structures, like structure_mask
+
+        """
+        if player_index is None:
+            return self.__upgraded[0] | self.__upgraded[1]
+        return self.__upgraded[player_index]
+
+    def zobrist_hash(self):
+        """Gets the board's Zobrist hash, kept up to date as structures change, so it costs nothing to ask for
+
+        Boards with the same structures, upgrades and health buckets (see health_bucket) have the
+        same hash whatever order they were built in. Mobile units are left out.
+
+        Returns:
+            A 64 bit int, 0 for an empty board
+
+        """
+        return self.__hash
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -200,21 +305,15 @@ class GameMap:
 
         """
         if radius < 0 or radius > self.ARENA_SIZE:
-            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
+            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}", radius, self.ARENA_SIZE)
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
-        x, y = location
-        locations = []
-        search_radius = math.ceil(radius)
+        x, y = map(int, location)
         getHitRadius = self.config["unitInformation"][0]['getHitRadius']
-        for i in range(int(x - search_radius), int(x + search_radius + 1)):
-            for j in range(int(y - search_radius), int(y + search_radius + 1)):
-                new_location = [i, j]
-                # A unit with a given range affects all locations who's centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
-        return locations
+        # A unit with a given range affects all locations who's centers are within that range + get hit radius
+        arena = tables.ARENA_TILES
+        return [[x + dx, y + dy] for dx, dy in tables.range_offsets(radius, getHitRadius) if (x + dx, y + dy) in arena]
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
@@ -232,9 +331,10 @@ class GameMap:
 
         return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
-    def warn(self, message):
+    def warn(self, message, *args):
         """
-        Used internally by game_map to print out default messaging
+        Used internally by game_map to print out default messaging.
+        The message is only formatted with args if warnings are enabled.
         """
         if(self.enable_warnings):
-            debug_write(message)
+            channel.warning(message, *args)
@@ -3,9 +3,11 @@ import json
 import sys
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .util import send_command
+from .debug_log import channel
 from .unit import GameUnit
 from .game_map import GameMap
+from .watchdog import current_watchdog
 
 def is_stationary(unit_type):
     """
@@ -145,9 +147,12 @@ class GameState:
                 elif unit_type == UPGRADE:
                     if self.contains_stationary_unit([x,y]):
                         self.game_map[x,y][0].upgrade()
+                        self.game_map.refresh_location([x,y])
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
                     self.game_map[x,y].append(unit)
+                    if unit.stationary:
+                        self.game_map.refresh_location([x,y])
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -166,20 +171,33 @@ class GameState:
         self._player_resources[player_index][resource_key] = held_resource + amount
 
     def _invalid_player_index(self, index):
-        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(index))
+        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)", index)
     
     def _invalid_unit(self, unit):
-        self.warn("Invalid unit {}".format(unit))
+        self.warn("Invalid unit {}", unit)
 
     def submit_turn(self):
         """Submit and end your turn.
             Must be called at the end of your turn or the algo will hang.
         """
+        watchdog = current_watchdog()
+        if watchdog is not None:
+            if not watchdog.submit(self._build_stack, self._deploy_stack):
+                self.warn("Turn was already submitted by the watchdog, this plan was not sent")
+            return
         build_string = json.dumps(self._build_stack)
         deploy_string = json.dumps(self._deploy_stack)
         send_command(build_string)
         send_command(deploy_string)
 
+    def commit_plan(self):
+        """Marks the deployments queued so far as the best plan for this turn.
+            If the turn watchdog reaches its time limit before submit_turn is called, the last committed plan is sent.
+        """
+        watchdog = current_watchdog()
+        if watchdog is not None:
+            watchdog.commit(self._build_stack, self._deploy_stack)
+
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
 
@@ -195,7 +213,7 @@ class GameState:
             self._invalid_player_index(player_index)
             return
         if not resource_type == self.MP and not resource_type == self.SP:
-            self.warn("Invalid resource_type '{}'. Please use MP (0) or SP (1)".format(resource_type))
+            self.warn("Invalid resource_type '{}'. Please use MP (0) or SP (1)", resource_type)
             return
 
         if resource_type == self.MP:
@@ -224,6 +242,20 @@ class GameState:
         resources = self._player_resources[player_index]
         return [resources.get(resource_key1, None), resources.get(resource_key2, None)]
 
+    def state_key(self):
+        """Gets a constant time cache key for the state: the map's Zobrist hash and both players' resources
+
+        Two states with the same key have the same structures, upgrades and health buckets
+        (see GameMap.zobrist_hash) and the same SP and MP, so anything worked out from those
+        alone can be cached under it.
+
+        Returns:
+            A tuple of the hash and each player's SP and MP
+
+        """
+        own, enemy = self._player_resources
+        return (self.game_map.zobrist_hash(), own['SP'], own['MP'], enemy['SP'], enemy['MP'])
+
     def number_affordable(self, unit_type):
         """The number of units of a given type we can afford
 
@@ -264,11 +296,11 @@ class GameState:
         """
 
         if turns_in_future < 1 or turns_in_future > 99:
-            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99".format(turns_in_future))
+            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99", turns_in_future)
         if not player_index == 1 and not player_index == 0:
             self._invalid_player_index(player_index)
         if type(current_MP) == int and current_MP < 0:
-            self.warn("Invalid current MP ({}). Current MP cannot be negative.".format(current_MP))
+            self.warn("Invalid current MP ({}). Current MP cannot be negative.", current_MP)
 
         MP = self.get_resource(self.MP, player_index) if not current_MP else current_MP
         for increment in range(1, turns_in_future + 1):
@@ -282,6 +314,54 @@ class GameState:
             MP = round(MP, 1)
         return MP
 
+    def structure_income(self, player_index=0):
+        """Gets the resources a player's structures generate each turn, from the config's generatesResource1 and 2
+
+        Args:
+            player_index: The player whose structures to count
+
+        Returns:
+            [SP, MP] generated per turn
+
+        """
+        income = [0, 0]
+        for unit in self.game_map.structures(player_index):
+            unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit.unit_type]]
+            if unit.upgraded:
+                unit_def = dict(unit_def, **unit_def.get("upgrade", {}))
+            income[SP] += unit_def.get("generatesResource1", 0)
+            income[MP] += unit_def.get("generatesResource2", 0)
+        return income
+
+    def project_resources(self, turns_in_future=10, income=None):
+        """Predicts both players' SP and MP on every turn up to turns_in_future, if nothing is spent
+
+        MP decays and grows as in project_future_MP, capped at the config's maxBits. SP grows by
+        coresPerRound. Both also grow by what the player's structures generate (see structure_income).
+        Every horizon of both players comes out of one pass, rather than a project_future_MP call each.
+
+        Args:
+            turns_in_future: The last turn to predict
+            income: [[SP, MP], [SP, MP]] generated per turn by each player's structures, worked out from the map if None
+
+        Returns:
+            A list indexed [player_index][turn][resource], turn 0 being now and resource SP (0) or MP (1)
+
+        """
+        resources = self.config["resources"]
+        if income is None:
+            income = [self.structure_income(0), self.structure_income(1)]
+        projection = [[self.get_resources(0)], [self.get_resources(1)]]
+        for increment in range(1, turns_in_future + 1):
+            current_turn = self.turn_number + increment
+            MP_gained = resources["bitsPerRound"] + resources["bitGrowthRate"] * (current_turn // resources["turnIntervalForBitSchedule"])
+            for player_index in (0, 1):
+                held_SP, held_MP = projection[player_index][-1]
+                held_MP = round(held_MP * (1 - resources["bitDecayPerRound"]) + MP_gained + income[player_index][MP], 1)
+                held_SP = held_SP + resources["coresPerRound"] + income[player_index][SP]
+                projection[player_index].append([held_SP, min(held_MP, resources.get("maxBits", held_MP))])
+        return projection
+
     def type_cost(self, unit_type, upgrade=False):
         """Gets the cost of a unit based on its type
 
@@ -326,14 +406,14 @@ class GameState:
         
         if not self.game_map.in_arena_bounds(location):
             if self.enable_warnings:
-                self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
+                self.warn("Could not spawn {} at location {}. Location invalid.", unit_type, location)
             return False
 
         affordable = self.number_affordable(unit_type) >= num
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = [location[0], location[1]] in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
 
         if self.enable_warnings:
             fail_reason = ""
@@ -346,7 +426,7 @@ class GameState:
             if not (stationary or on_edge):
                 fail_reason = fail_reason + " Information units must be deployed on the edge."
             if len(fail_reason) > 0:
-                self.warn("Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason))
+                self.warn("Could not spawn {} at location {}.{}", unit_type, location, fail_reason)
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
@@ -368,7 +448,7 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         if num < 1:
-            self.warn("Attempted to spawn fewer than one units! ({})".format(num))
+            self.warn("Attempted to spawn fewer than one units! ({})", num)
             return
       
         if type(locations[0]) == int:
@@ -410,7 +490,7 @@ class GameState:
                 self._build_stack.append((REMOVE, x, y))
                 removed_units += 1
             else:
-                self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.".format(location))
+                self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.", location)
         return removed_units
 
     def attempt_upgrade(self, locations):
@@ -442,10 +522,11 @@ class GameState:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
                         existing_unit.upgrade()
+                        self.game_map.refresh_location([x, y])
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
-                self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
+                self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.", location)
         return spawned_units
 
     def get_target_edge(self, start_location):
@@ -485,7 +566,7 @@ class GameState:
 
         """
         if self.contains_stationary_unit(start_location):
-            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            self.warn("Attempted to perform pathing from blocked starting location {}", start_location)
             return
 
         if target_edge is None:
@@ -513,12 +594,37 @@ class GameState:
                 return unit
         return False
 
-    def warn(self, message):
-        """ Used internally by game_state to print warnings
+    def get_structures_to_repair(self, health_fraction=0.9, include_unupgraded=True, player_index=0):
+        """Lists a player's structures that are damaged or not upgraded, most in need of repair first
+
+        Uses the map's structure index, so this costs O(structures) rather than a scan of the board.
+
+        Args:
+            health_fraction: Structures at or below this fraction of their max health are included
+            include_unupgraded: If true, structures that are not upgraded are included whatever their health
+            player_index: The index corresponding to the player whose structures to list, 0 for you 1 for the enemy
+
+        Returns:
+            A list of structure units, lowest fraction of max health first, then un-upgraded before upgraded,
+            then by lowest y and x
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+        repairs = []
+        for unit in self.game_map.structures(player_index):
+            if (include_unupgraded and not unit.upgraded) or unit.health <= unit.max_health * health_fraction:
+                repairs.append(unit)
+        repairs.sort(key=lambda unit: (unit.health / unit.max_health, unit.upgraded, unit.y, unit.x))
+        return repairs
+
+    def warn(self, message, *args):
+        """ Used internally by game_state to print warnings.
+            The message is only formatted with args if warnings are enabled.
         """
 
         if(self.enable_warnings):
-            debug_write(message)
+            channel.warning(message, *args)
 
     def suppress_warnings(self, suppress):
         """Suppress all warnings
@@ -547,7 +653,7 @@ class GameState:
         """
 
         if not isinstance(attacking_unit, GameUnit):
-            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
+            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.", type(attacking_unit))
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
@@ -625,7 +731,7 @@ class GameState:
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
-            self.warn("Location {} is not in the arena bounds.".format(location))
+            self.warn("Location {} is not in the arena bounds.", location)
 
         attackers = []
         """
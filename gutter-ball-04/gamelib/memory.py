@@ -0,0 +1,124 @@
+import gc
+import os
+import tracemalloc
+
+from .game_state import GameState
+from .game_map import GameMap
+from .unit import GameUnit
+from .navigation import ShortestPathFinder
+
+
+class MemoryReport:
+    """Per-turn memory accounting with tracemalloc, for finding leaks.
+
+    start() turns tracemalloc on. AlgoCore calls end_turn() after each turn has been
+    submitted, which snapshots the traced allocations every `every` turns and logs the
+    current and peak traced memory, the allocation sites that grew the most since the
+    previous snapshot, and how many GameStates, GameMaps, GameUnits and
+    ShortestPathFinders are still alive. finish() logs the largest allocation sites and
+    the growth since the first snapshot, then stops tracing.
+
+    tracemalloc slows allocation down noticeably, so only turn this on while investigating.
+
+    Attributes :
+        * top (int): How many allocation sites to list
+        * every (int): Snapshot every this many turns
+        * frames (int): Stack frames to keep per allocation, more makes sites easier to place but costs more
+        * history (list): (turn, current bytes, peak bytes) for every snapshot taken
+
+    """
+    TRACKED_TYPES = (GameState, GameMap, GameUnit, ShortestPathFinder)
+
+    def __init__(self, top=5, every=1, frames=1):
+        self.top = top
+        self.every = max(1, every)
+        self.frames = frames
+        self.history = []
+        self._turns = 0
+        self._first = None
+        self._previous = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+    def live_objects(self):
+        """Counts the live instances of TRACKED_TYPES
+
+        Returns:
+            A dict of class name to count
+
+        """
+        counts = {kind.__name__: 0 for kind in self.TRACKED_TYPES}
+        for obj in gc.get_objects():
+            if isinstance(obj, self.TRACKED_TYPES):
+                counts[type(obj).__name__] += 1
+        return counts
+
+    def end_turn(self, channel):
+        """Snapshots memory if this is one of the turns to, and logs what changed
+
+        Args:
+            channel: The DebugChannel to log to
+
+        """
+        self._turns += 1
+        if not tracemalloc.is_tracing() or (self._turns - 1) % self.every != 0:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.history.append((self._turns, current, peak))
+        snapshot = self._snapshot()
+        lines = []
+        if self._previous is not None:
+            for stat in snapshot.compare_to(self._previous, "lineno")[:self.top]:
+                if stat.size_diff > 0:
+                    lines.append("  {:+.1f} KiB {:+d} blocks  {}".format(stat.size_diff / 1024, stat.count_diff, stat.traceback))
+        counts = self.live_objects()
+        lines.append("  live: " + ", ".join("{} {}".format(name, count) for name, count in counts.items()))
+        # Each report has its own format string, so the channel's rate limit keeps them apart
+        channel.info("Memory after turn {}: {:.1f} KiB traced, {:.1f} KiB peak this turn\n{}",
+                     self._turns, current / 1024, peak / 1024, "\n".join(lines))
+        if self._first is None:
+            self._first = snapshot
+        self._previous = snapshot
+
+    def finish(self, channel):
+        """Logs the largest allocation sites and the growth since the first snapshot, and stops tracing
+
+        Args:
+            channel: The DebugChannel to log to
+
+        """
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = self._snapshot()
+        lines = []
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            lines.append("  {:.1f} KiB {} blocks  {}".format(stat.size / 1024, stat.count, stat.traceback))
+        if self._first is not None:
+            lines.append("Growth since the first turn:")
+            for stat in snapshot.compare_to(self._first, "lineno")[:self.top]:
+                lines.append("  {:+.1f} KiB {:+d} blocks  {}".format(stat.size_diff / 1024, stat.count_diff, stat.traceback))
+        if len(self.history) > 0:
+            lines.append("Peak traced memory in any turn: {:.1f} KiB".format(max(peak for _, _, peak in self.history) / 1024))
+        channel.info("Largest allocation sites at game end:\n{}", "\n".join(lines))
+        self._first = self._previous = None
+        tracemalloc.stop()
+
+
+def from_environment():
+    """Makes the MemoryReport the environment asks for, or returns None
+
+    ALGO_MEMORY=1 reports every turn, ALGO_MEMORY=N every N turns.
+    """
+    setting = os.environ.get("ALGO_MEMORY", "")
+    if setting in ("", "0"):
+        return None
+    return MemoryReport(every=int(setting) if setting.isdigit() else 1)
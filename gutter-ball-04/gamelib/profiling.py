@@ -0,0 +1,145 @@
+import cProfile
+import functools
+import heapq
+import os
+import threading
+import time
+
+from .game_state import GameState
+
+
+class Profiler:
+    """Times the algo's turn hooks and gamelib's hot paths, and optionally cProfiles the slowest turns.
+
+    install() wraps on_turn and on_action_frame on one algo, and GameState.__init__,
+    find_path_to_edge, get_attackers and get_target for every GameState, with a timer and
+    a call counter. Calls from the background precompute thread are counted too.
+
+    With slowest > 0 every on_turn also runs under cProfile, and the profiles of the
+    slowest turns are kept in memory. finish() writes them to directory as
+    turn_<n>.prof files, which pstats or snakeviz can read, and logs a summary table.
+
+    Attributes :
+        * slowest (int): How many of the slowest turns to keep cProfile stats for, 0 to never run cProfile
+        * directory (str): Where finish() writes the cProfile stats
+        * timers (dict): Name of each wrapped function to [calls, total seconds, max seconds]
+
+    """
+    HOT_PATHS = ["__init__", "find_path_to_edge", "get_attackers", "get_target"]
+
+    def __init__(self, slowest=0, directory="."):
+        self.slowest = slowest
+        self.directory = directory
+        self.timers = {}
+        self._slow_turns = []
+        self._patched = []
+        self._lock = threading.Lock()
+
+    def _timed(self, name, function, profile=False):
+        timer = self.timers.setdefault(name, [0, 0.0, 0.0])
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = cProfile.Profile() if profile else None
+            start = time.perf_counter()
+            try:
+                if profiler is not None:
+                    return profiler.runcall(function, *args, **kwargs)
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    timer[0] += 1
+                    timer[1] += elapsed
+                    if elapsed > timer[2]:
+                        timer[2] = elapsed
+                    if profiler is not None:
+                        self._keep(elapsed, timer[0], profiler)
+        return wrapper
+
+    def _keep(self, elapsed, turn, profiler):
+        heapq.heappush(self._slow_turns, (elapsed, turn, profiler))
+        if len(self._slow_turns) > self.slowest:
+            heapq.heappop(self._slow_turns)
+
+    def _patch(self, owner, attribute, name, profile=False):
+        original = owner.__dict__.get(attribute)
+        setattr(owner, attribute, self._timed(name, getattr(owner, attribute), profile))
+        self._patched.append((owner, attribute, original))
+
+    def install(self, algo):
+        """Starts timing algo's turn hooks and the GameState hot paths
+
+        Args:
+            algo: The AlgoCore to time on_turn and on_action_frame on
+
+        """
+        if len(self._patched) > 0:
+            return
+        self._patch(algo, "on_turn", "on_turn", self.slowest > 0)
+        self._patch(algo, "on_action_frame", "on_action_frame")
+        for attribute in self.HOT_PATHS:
+            self._patch(GameState, attribute, "GameState." + attribute)
+
+    def uninstall(self):
+        """Puts back everything install() wrapped
+        """
+        for owner, attribute, original in reversed(self._patched):
+            if original is None:
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, original)
+        self._patched = []
+
+    def summary(self):
+        """Returns the timer table as lines of text, the most expensive function in total first
+        """
+        lines = ["{:<28}{:>8}{:>12}{:>10}{:>10}".format("function", "calls", "total ms", "mean ms", "max ms")]
+        with self._lock:
+            timers = sorted(self.timers.items(), key=lambda item: -item[1][1])
+        for name, (calls, total, longest) in timers:
+            mean = total / calls if calls else 0.0
+            lines.append("{:<28}{:>8}{:>12.1f}{:>10.2f}{:>10.2f}".format(name, calls, 1000*total, 1000*mean, 1000*longest))
+        return lines
+
+    def dump(self):
+        """Writes the kept cProfile stats to directory
+
+        Returns:
+            The paths written, slowest turn first
+
+        """
+        paths = []
+        with self._lock:
+            slow_turns = sorted(self._slow_turns, key=lambda entry: -entry[0])
+        if len(slow_turns) > 0:
+            os.makedirs(self.directory, exist_ok=True)
+        for elapsed, turn, profiler in slow_turns:
+            path = os.path.join(self.directory, "turn_{}.prof".format(turn))
+            profiler.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def finish(self, channel):
+        """Logs the summary to a debug channel and dumps the cProfile stats, called by AlgoCore at game end
+
+        Args:
+            channel: The DebugChannel to log to
+
+        """
+        channel.info("Time spent in the profiled functions:\n{}", "\n".join(self.summary()))
+        paths = self.dump()
+        if len(paths) > 0:
+            channel.info("Wrote cProfile stats for the slowest turns to {}", ", ".join(paths))
+        self.uninstall()
+
+
+def from_environment():
+    """Makes the Profiler the environment asks for, or returns None
+
+    ALGO_PROFILE=1 turns on the timers, ALGO_PROFILE_SLOWEST=N also keeps cProfile stats for
+    the N slowest turns and ALGO_PROFILE_DIR sets where they are written.
+    """
+    if os.environ.get("ALGO_PROFILE", "") in ("", "0"):
+        return None
+    return Profiler(int(os.environ.get("ALGO_PROFILE_SLOWEST", "0")), os.environ.get("ALGO_PROFILE_DIR", "."))
@@ -0,0 +1,131 @@
+import re
+import sys
+import threading
+from collections import deque
+
+from .util import debug_write
+
+CONFIG = "config"
+TURN = "turn"
+ACTION_FRAME = "action_frame"
+END = "end"
+UNKNOWN = "unknown"
+EOF = "eof"
+
+_TURN_INFO = re.compile(r'"turnInfo"\s*:\s*\[\s*"?(\d+)')
+_TURN_TYPES = {0: TURN, 1: ACTION_FRAME, 2: END}
+
+
+def classify(message):
+    """Works out what kind of engine message a line is without parsing all of it
+
+    Args:
+        message: A line received from the game engine
+
+    Returns:
+        One of CONFIG, TURN, ACTION_FRAME, END or UNKNOWN
+
+    """
+    match = _TURN_INFO.search(message)
+    if match:
+        return _TURN_TYPES.get(int(match.group(1)), UNKNOWN)
+    if "replaySave" in message:
+        return CONFIG
+    return UNKNOWN
+
+
+class CommandReader:
+    """Reads engine messages from stdin on its own thread.
+
+    Messages are classified as they arrive and queued for the strategy thread.
+    Config, turn and end messages are never dropped. Action frames go stale quickly,
+    so when the strategy falls behind:
+        * At most max_frames action frames are kept, the oldest are dropped first
+        * A run of queued action frames is coalesced into the newest one on get()
+        * Action frames still queued when a turn or end message arrives are dropped,
+          so a turn never waits behind frame handling
+
+    Attributes :
+        * dropped_frames (int): How many action frames were dropped or coalesced away
+
+    """
+    def __init__(self, stream=None, max_frames=16, on_message=None):
+        """Creates a reader, call start() to begin reading
+
+        Args:
+            stream: The stream to read lines from, sys.stdin if None
+            max_frames: The most action frames to keep queued
+            on_message: Called on the reader thread with every line read, including frames that are later dropped
+
+        """
+        self.dropped_frames = 0
+        self._on_message = on_message
+        self._stream = stream
+        self._max_frames = max_frames
+        self._queue = deque()
+        self._frames = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stdin-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stream = self._stream if self._stream is not None else sys.stdin
+        while True:
+            try:
+                line = stream.readline()
+            except (EOFError, ValueError):
+                line = ""
+            if line == "":
+                self._put(EOF, line)
+                return
+            if self._on_message is not None:
+                self._on_message(line)
+            self._put(classify(line), line)
+
+    def _put(self, kind, message):
+        with self._condition:
+            if kind == ACTION_FRAME:
+                if self._frames >= self._max_frames:
+                    self._drop_frames(1)
+                self._frames += 1
+            elif kind in (TURN, END) and self._frames > 0:
+                self._drop_frames(self._frames)
+            self._queue.append((kind, message))
+            self._condition.notify()
+
+    def _drop_frames(self, count):
+        kept = deque()
+        for kind, message in self._queue:
+            if kind == ACTION_FRAME and count > 0:
+                count -= 1
+                self._frames -= 1
+                self.dropped_frames += 1
+                continue
+            kept.append((kind, message))
+        self._queue = kept
+
+    def get(self):
+        """Blocks until a message is available
+
+        Returns:
+            A (kind, message) tuple. Exits the process if the engine closed stdin, like util.get_command().
+
+        """
+        with self._condition:
+            while len(self._queue) == 0:
+                self._condition.wait()
+            kind, message = self._queue.popleft()
+            if kind == ACTION_FRAME:
+                self._frames -= 1
+                while len(self._queue) > 0 and self._queue[0][0] == ACTION_FRAME:
+                    kind, message = self._queue.popleft()
+                    self._frames -= 1
+                    self.dropped_frames += 1
+        if kind == EOF:
+            # Happens if parent game process dies, so exit for cleanup
+            debug_write("Got EOF, parent game process must have died, exiting for cleanup")
+            exit()
+        return kind, message
@@ -0,0 +1,114 @@
+import struct
+import threading
+import time
+import zlib
+
+INBOUND = 0
+OUTBOUND = 1
+
+MAGIC = b"C1RP\x01"
+_BLOCK = struct.Struct("<I")
+_RECORD = struct.Struct("<BdI")
+
+
+class ReplayRecorder:
+    """Records engine traffic to a compact, append-only binary log.
+
+    record() only appends to an in-memory list, so it is cheap enough for every action frame,
+    and it is safe to call from the reader thread while end_turn() runs. end_turn() packs
+    everything recorded since the previous call into one zlib compressed block and appends
+    it to the file. AlgoCore calls it after each turn has been submitted, so compression
+    never delays a response.
+
+    The file is MAGIC followed by blocks. Each block is a little endian uint32 length and that
+    many bytes of zlib data, which inflate to records of (direction byte, float64 seconds since
+    recording started, uint32 length) followed by the UTF-8 message.
+
+    Attributes :
+        * path (str): The file the log is appended to
+
+    """
+    def __init__(self, path, compression_level=1):
+        """Opens the log, writing the header if the file is new
+
+        Args:
+            path: The file to append the log to
+            compression_level: zlib level for each block, low levels keep end_turn fast
+
+        """
+        self.path = path
+        self._level = compression_level
+        self._records = []
+        # _lock guards the pending records and _write_lock the file,
+        # so record() never waits on compression
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def record(self, direction, message):
+        """Remembers one message, INBOUND from the engine or OUTBOUND to it
+        """
+        with self._lock:
+            self._records.append((direction, time.perf_counter() - self._start, message))
+
+    def record_outbound(self, message):
+        self.record(OUTBOUND, message)
+
+    def end_turn(self):
+        """Compresses the messages recorded since the last call into one block and appends it
+        """
+        with self._write_lock:
+            with self._lock:
+                records, self._records = self._records, []
+            if len(records) == 0 or self._file is None:
+                return
+            chunks = []
+            for direction, timestamp, message in records:
+                data = message.encode("utf-8")
+                chunks.append(_RECORD.pack(direction, timestamp, len(data)))
+                chunks.append(data)
+            block = zlib.compress(b"".join(chunks), self._level)
+            self._file.write(_BLOCK.pack(len(block)) + block)
+            self._file.flush()
+
+    def close(self):
+        self.end_turn()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_replay(path):
+    """Reads back a log written by ReplayRecorder
+
+    Args:
+        path: The log file
+
+    Returns:
+        A generator of (direction, seconds since recording started, message) tuples.
+        A block truncated by a crash ends the log instead of raising.
+
+    """
+    with open(path, "rb") as replay:
+        if replay.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a replay log".format(path))
+        while True:
+            header = replay.read(_BLOCK.size)
+            if len(header) < _BLOCK.size:
+                return
+            size, = _BLOCK.unpack(header)
+            block = replay.read(size)
+            if len(block) < size:
+                return
+            data = zlib.decompress(block)
+            offset = 0
+            while offset < len(data):
+                direction, timestamp, length = _RECORD.unpack_from(data, offset)
+                offset += _RECORD.size
+                yield direction, timestamp, data[offset:offset + length].decode("utf-8")
+                offset += length
@@ -0,0 +1,126 @@
+import time
+import traceback
+
+from .game_state import GameState
+from .util import debug_write
+
+
+class TurnScheduler:
+    """Runs optional analysis stages in priority order under a wall-clock deadline.
+
+    A turn is planned in three steps. First a cheap fallback plan is built on its own
+    GameState, so there is always something valid to submit (an empty plan if building it
+    fails). Then the analysis stages run, highest priority first, skipping any stage whose
+    expected duration no longer fits before the deadline. Finally the real plan is built
+    from the stage results and submitted, or the fallback is submitted instead if the plan
+    fails or time has run out.
+
+    Attributes :
+        * budget (float): Seconds from the start of the turn until the plan must be submitted
+        * margin (float): Seconds held back for building and submitting the final plan
+        * results (dict): Output of the stages that ran this turn, keyed by stage name
+        * skipped (list): Names of the stages that did not fit in this turn's budget
+
+    """
+    def __init__(self, budget, margin=0.1):
+        """Sets up an empty scheduler
+
+        Args:
+            budget: Seconds from the start of the turn until the plan must be submitted
+            margin: Seconds held back for building and submitting the final plan
+
+        """
+        self.budget = budget
+        self.margin = margin
+        self.results = {}
+        self.skipped = []
+        self._stages = []
+        self._estimates = {}
+
+    def add_stage(self, name, function, priority=0, estimate=0.0):
+        """Registers an optional analysis stage
+
+        Args:
+            name: The key the stage's result is stored under in results
+            function: Called as function(game_state, results, deadline), deadline being
+                a time.perf_counter() value
+            priority: Stages with a higher priority run first
+            estimate: Expected duration in seconds, used until the stage has been timed
+
+        """
+        self._stages.append((priority, len(self._stages), name, function))
+        self._stages.sort(key=lambda stage: (-stage[0], stage[1]))
+        self._estimates[name] = estimate
+
+    def remaining(self):
+        """Seconds left before the final plan has to be built
+        """
+        return self._deadline - time.perf_counter()
+
+    def _timed(self, name, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Exponential average, so one slow turn does not starve a stage forever
+            self._estimates[name] = 0.5 * self._estimates.get(name, elapsed) + 0.5 * elapsed
+
+    def _fresh_state(self, game_state):
+        state = GameState(game_state.config, game_state.serialized_string)
+        state.suppress_warnings(True)
+        return state
+
+    def run(self, game_state, fallback, plan, start_time=None):
+        """Plans and submits one turn
+
+        Args:
+            game_state: The GameState the real plan is built on
+            fallback: Called as fallback(game_state) on a fresh copy of the turn, should be cheap
+            plan: Called as plan(game_state, results) to build the real plan
+            start_time: The time.perf_counter() value the turn started at, now if None
+
+        Returns:
+            The GameState that was submitted
+
+        """
+        start_time = time.perf_counter() if start_time is None else start_time
+        self._deadline = start_time + self.budget - self.margin
+        self.results = {}
+        self.skipped = []
+
+        fallback_state = self._fresh_state(game_state)
+        try:
+            self._timed("fallback", fallback, fallback_state)
+        except Exception:
+            # Still plan the turn, with an empty plan to fall back on
+            debug_write("Fallback failed, an empty plan is committed instead:\n{}".format(
+                traceback.format_exc()))
+            fallback_state = self._fresh_state(game_state)
+        fallback_state.commit_plan()
+
+        for _, _, name, function in self._stages:
+            if self._estimates[name] >= self.remaining():
+                self.skipped.append(name)
+                continue
+            try:
+                self.results[name] = self._timed(name, function, game_state, self.results,
+                                                 self._deadline)
+            except Exception:
+                debug_write("Stage {} failed and was skipped:\n{}".format(
+                    name, traceback.format_exc()))
+        if len(self.skipped) > 0:
+            debug_write("Out of turn budget, skipped stages: {}".format(self.skipped))
+
+        submitted = fallback_state
+        if self._estimates.get("plan", 0) < self.remaining() + self.margin:
+            try:
+                self._timed("plan", plan, game_state, self.results)
+                submitted = game_state
+            except Exception:
+                debug_write("Plan failed, submitting the fallback plan:\n{}".format(
+                    traceback.format_exc()))
+        else:
+            debug_write("No time left to plan, submitting the fallback plan")
+        submitted.submit_turn()
+        return submitted
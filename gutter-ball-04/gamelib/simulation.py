@@ -0,0 +1,295 @@
+import numpy as np
+
+from .unit import GameUnit
+
+
+class SimulationResult:
+    """Outcome of a batched simulation, one row per candidate deployment.
+
+    Attributes :
+        * breaches (ndarray): (N, 2) mobile units of each player that reached their target edge
+        * structure_damage (ndarray): (N, 2) damage taken by the structures of each player
+        * structures_destroyed (ndarray): (N, 2) number of structures each player lost
+        * frames (int): The number of action frames that were simulated
+
+    """
+    def __init__(self, breaches, structure_damage, structures_destroyed, frames):
+        self.breaches = breaches
+        self.structure_damage = structure_damage
+        self.structures_destroyed = structures_destroyed
+        self.frames = frames
+
+    def score(self, player_index=0, structure_weight=0.5):
+        """A scalar value per candidate from the point of view of the given player.
+
+        Args:
+            player_index: The player we are scoring for, 0 for you 1 for the enemy
+            structure_weight: What one destroyed structure is worth relative to one breach
+
+        Returns:
+            An (N,) array: breaches scored minus breaches conceded, plus weighted structure trades
+
+        """
+        enemy_index = 1 - player_index
+        return (self.breaches[:, player_index] - self.breaches[:, enemy_index]) + \
+            structure_weight * (self.structures_destroyed[:, enemy_index] - self.structures_destroyed[:, player_index])
+
+
+class BatchSimulator:
+    """Simulates many candidate deployments against one shared board at once.
+
+    Every candidate gets its own row along a leading batch axis, so structure health,
+    unit positions and unit health are (N, ...) arrays and one vectorized frame step
+    advances all candidates together.
+
+    A candidate is a list of (unit_type, location, num) entries for player 0. Mobile entries
+    deploy num units at location. Structure entries are built for that candidate only, and
+    entries using the upgrade shorthand upgrade the structure at location for that candidate only.
+
+    This is a coarse model of the action phase meant for ranking candidates, not replaying them:
+        * Paths are computed once at deploy time and are not recomputed when structures die
+        * All attacks in a frame resolve simultaneously, mobile units prefer mobile targets
+        * Units that cannot reach an edge are removed at the end of their path without self destructing
+
+    Attributes :
+        * game_state (:obj: GameState): The shared starting board
+        * config (JSON): Contains information about the game
+
+    """
+    def __init__(self, game_state):
+        """Collects the structures of the shared starting board
+
+        Args:
+            game_state: A GameState object representing the board every candidate starts from
+
+        """
+        self.game_state = game_state
+        self.config = game_state.config
+        self._upgrade_type = self.config["unitInformation"][7]["shorthand"]
+        self._prototypes = {}
+        self._path_cache = {}
+        self._structures = []
+        for location in game_state.game_map:
+            unit = game_state.contains_stationary_unit(location)
+            if unit:
+                self._structures.append(unit)
+
+    def _prototype(self, unit_type):
+        if unit_type not in self._prototypes:
+            self._prototypes[unit_type] = GameUnit(unit_type, self.config)
+        return self._prototypes[unit_type]
+
+    def _path(self, builds, location):
+        """The path from location with the candidate-only structures in builds placed on the map.
+        """
+        key = (builds, tuple(location))
+        if key in self._path_cache:
+            return self._path_cache[key]
+        game_map = self.game_state.game_map
+        saved = {}
+        for unit_type, x, y in builds:
+            saved[(x, y)] = list(game_map[x, y])
+            game_map.add_unit(unit_type, [x, y], 0)
+        try:
+            path = self.game_state.find_path_to_edge(location)
+        finally:
+            for (x, y), units in saved.items():
+                game_map[x, y] = units
+        if path is not None:
+            target_edge = self.game_state.get_target_edge(location)
+            edge = self.game_state.game_map.get_edge_locations(target_edge)
+            path = (path, path[-1] in edge)
+        self._path_cache[key] = path
+        return path
+
+    def _split_candidate(self, candidate):
+        """Separates a candidate into its structure builds, upgrades and mobile spawns.
+        """
+        builds = []
+        upgrades = []
+        spawns = []
+        occupied = set()
+        for unit_type, location, num in candidate:
+            x, y = map(int, location)
+            if unit_type == self._upgrade_type:
+                upgrades.append((x, y))
+            elif self._prototype(unit_type).stationary:
+                if (x, y) in occupied or self.game_state.contains_stationary_unit([x, y]):
+                    continue
+                occupied.add((x, y))
+                builds.append((unit_type, x, y))
+            else:
+                spawns.append((unit_type, [x, y], num))
+        return tuple(sorted(builds)), upgrades, spawns
+
+    def _structure_table(self, candidates_split):
+        """Builds the (N, S) structure arrays covering board structures and every candidate build.
+        """
+        n = len(candidates_split)
+        columns = list(self._structures)
+        column_index = {(unit.x, unit.y): i for i, unit in enumerate(columns)}
+        present = []
+        for builds, _, _ in candidates_split:
+            row = set()
+            for unit_type, x, y in builds:
+                key = (unit_type, x, y)
+                if key not in column_index:
+                    column_index[key] = len(columns)
+                    columns.append(GameUnit(unit_type, self.config, 0, None, x, y))
+                row.add(column_index[key])
+            present.append(row)
+
+        s = len(columns)
+        base_count = len(self._structures)
+        stats = np.zeros((2, 6, s))
+        for j, unit in enumerate(columns):
+            upgraded = unit
+            if not unit.upgraded:
+                upgraded = GameUnit(unit.unit_type, self.config, unit.player_index, unit.health, unit.x, unit.y)
+                upgraded.upgrade()
+            for k, variant in enumerate((unit, upgraded)):
+                stats[k, :, j] = (variant.health, variant.damage_f, variant.damage_i,
+                                  variant.attackRange, variant.shieldRange, variant.shieldPerUnit)
+
+        is_upgraded = np.zeros((n, s), dtype=bool)
+        exists = np.zeros((n, s), dtype=bool)
+        exists[:, :base_count] = True
+        for b, (builds, upgrades, _) in enumerate(candidates_split):
+            exists[b, list(present[b])] = True
+            for x, y in upgrades:
+                for j in range(s):
+                    if columns[j].x == x and columns[j].y == y and exists[b, j]:
+                        is_upgraded[b, j] = True
+
+        table = np.where(is_upgraded[None, :, :], stats[1][:, None, :], stats[0][:, None, :])
+        health = np.where(exists, table[0], 0.0)
+        positions = np.array([[unit.x, unit.y] for unit in columns], dtype=float).reshape(s, 2)
+        owners = np.array([unit.player_index for unit in columns], dtype=int)
+        return positions, owners, health, table[1], table[2], table[3], table[4], table[5]
+
+    def simulate(self, candidates, opponent=None, max_frames=300):
+        """Runs every candidate deployment on the shared board
+
+        Args:
+            candidates: A list of N candidates, each a list of (unit_type, location, num) entries for player 0
+            opponent: An optional list of (unit_type, location, num) mobile spawns for player 1, shared by every candidate
+            max_frames: The most action frames to simulate
+
+        Returns:
+            A SimulationResult with one row per candidate
+
+        """
+        opponent = opponent or []
+        n = len(candidates)
+        split = [self._split_candidate(candidate) for candidate in candidates]
+        s_pos, s_owner, s_health, s_damage_f, s_damage_i, s_range, s_shield_range, s_shield = self._structure_table(split)
+
+        rows = []
+        for builds, _, spawns in split:
+            row = []
+            for owner, entries in ((0, spawns), (1, opponent)):
+                for unit_type, location, num in entries:
+                    path = self._path(builds, location)
+                    if path is None:
+                        continue
+                    row.extend([(unit_type, owner, path)] * int(num))
+            rows.append(row)
+
+        u = max([len(row) for row in rows] + [1])
+        length = max([len(path[0]) for row in rows for _, _, path in row] + [1])
+        paths = np.zeros((n, u, length, 2), dtype=int)
+        path_len = np.ones((n, u), dtype=int)
+        can_breach = np.zeros((n, u), dtype=bool)
+        alive = np.zeros((n, u), dtype=bool)
+        u_owner = np.zeros((n, u), dtype=int)
+        u_health = np.zeros((n, u))
+        u_speed = np.zeros((n, u))
+        u_damage_f = np.zeros((n, u))
+        u_damage_i = np.zeros((n, u))
+        u_range = np.zeros((n, u))
+        for b, row in enumerate(rows):
+            for i, (unit_type, owner, (path, reaches_edge)) in enumerate(row):
+                unit = self._prototype(unit_type)
+                paths[b, i, :len(path)] = path
+                paths[b, i, len(path):] = path[-1]
+                path_len[b, i] = len(path)
+                can_breach[b, i] = reaches_edge
+                alive[b, i] = True
+                u_owner[b, i] = owner
+                u_health[b, i] = unit.max_health
+                u_speed[b, i] = unit.speed
+                u_damage_f[b, i] = unit.damage_f
+                u_damage_i[b, i] = unit.damage_i
+                u_range[b, i] = unit.attackRange
+
+        breaches = np.zeros((n, 2))
+        structure_damage = np.zeros((n, 2))
+        structures_destroyed = np.zeros((n, 2))
+        step = np.zeros((n, u), dtype=int)
+        progress = np.zeros((n, u))
+        shielded = np.zeros((n, u, len(s_owner)), dtype=bool)
+        batch_index = np.arange(n)[:, None]
+        unit_index = np.arange(u)[None, :]
+        friendly = u_owner[:, :, None] == s_owner[None, None, :]
+        hostile_units = u_owner[:, :, None] != u_owner[:, None, :]
+
+        frame = 0
+        while frame < max_frames and alive.any():
+            frame += 1
+            s_alive = s_health > 0
+
+            # Movement, then scoring for units at the end of their path
+            progress += u_speed * alive
+            moving = progress >= 1 - 1e-9
+            progress[moving] -= 1
+            step = np.minimum(step + moving, path_len - 1)
+            finished = alive & (step == path_len - 1)
+            for owner in (0, 1):
+                breaches[:, owner] += (finished & can_breach & (u_owner == owner)).sum(axis=1)
+            alive &= ~finished
+            position = paths[batch_index, unit_index, step].astype(float)
+
+            distance_us = np.sqrt(((position[:, :, None, :] - s_pos[None, None, :, :]) ** 2).sum(axis=3))
+            distance_uu = np.sqrt(((position[:, :, None, :] - position[:, None, :, :]) ** 2).sum(axis=3))
+
+            # Shields from friendly supports, once per support per unit
+            shielding = alive[:, :, None] & s_alive[:, None, :] & friendly & ~shielded & \
+                (s_shield[:, None, :] > 0) & (distance_us <= s_shield_range[:, None, :])
+            u_health += (shielding * s_shield[:, None, :]).sum(axis=2)
+            shielded |= shielding
+
+            unit_damage = np.zeros((n, u))
+            s_damage = np.zeros(s_health.shape)
+
+            # Structures attack the nearest hostile mobile unit in range
+            in_range = alive[:, :, None] & s_alive[:, None, :] & ~friendly & \
+                (s_damage_i[:, None, :] > 0) & (distance_us <= s_range[:, None, :])
+            masked = np.where(in_range, distance_us, np.inf)
+            b, j = np.nonzero(in_range.any(axis=1))
+            np.add.at(unit_damage, (b, masked.argmin(axis=1)[b, j]), s_damage_i[b, j])
+
+            # Mobile units prefer hostile mobile units, then fall back to structures
+            in_range = alive[:, :, None] & alive[:, None, :] & hostile_units & \
+                (u_damage_i[:, :, None] > 0) & (distance_uu <= u_range[:, :, None])
+            masked = np.where(in_range, distance_uu, np.inf)
+            has_unit_target = in_range.any(axis=2)
+            b, i = np.nonzero(has_unit_target)
+            np.add.at(unit_damage, (b, masked.argmin(axis=2)[b, i]), u_damage_i[b, i])
+
+            if len(s_owner) > 0:
+                in_range = (alive & ~has_unit_target)[:, :, None] & s_alive[:, None, :] & ~friendly & \
+                    (u_damage_f[:, :, None] > 0) & (distance_us <= u_range[:, :, None])
+                masked = np.where(in_range, distance_us, np.inf)
+                b, i = np.nonzero(in_range.any(axis=2))
+                np.add.at(s_damage, (b, masked.argmin(axis=2)[b, i]), u_damage_f[b, i])
+
+            taken = np.minimum(s_damage, np.maximum(s_health, 0))
+            s_health = s_health - s_damage
+            destroyed = s_alive & (s_health <= 0)
+            for owner in (0, 1):
+                structure_damage[:, owner] += taken[:, s_owner == owner].sum(axis=1)
+                structures_destroyed[:, owner] += destroyed[:, s_owner == owner].sum(axis=1)
+            u_health -= unit_damage
+            alive &= u_health > 0
+
+        return SimulationResult(breaches, structure_damage, structures_destroyed, frame)
@@ -0,0 +1,83 @@
+import functools
+import json
+import math
+import os
+
+TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "board_tables.json")
+ARENA_SIZE = 28
+
+
+def build(arena_size=ARENA_SIZE):
+    """Works out the board tables from the diamond's geometry
+
+    Args:
+        arena_size: The width and height of the arena
+
+    Returns:
+        A dict with "arena", every [x, y] on the board, and "edges", the four edges'
+        locations in the order of GameMap.get_edges
+
+    """
+    half = arena_size // 2
+    arena = []
+    for y in range(arena_size):
+        row_size = y + 1 if y < half else arena_size - y
+        arena += [[x, y] for x in range(half - row_size, half + row_size)]
+    edges = [
+        [[half + num, arena_size - 1 - num] for num in range(half)],
+        [[half - 1 - num, arena_size - 1 - num] for num in range(half)],
+        [[half - 1 - num, num] for num in range(half)],
+        [[half + num, num] for num in range(half)],
+    ]
+    return {"arena_size": arena_size, "arena": arena, "edges": edges}
+
+
+def write(path=TABLES_PATH, arena_size=ARENA_SIZE):
+    """Writes the board tables to path, run this module to regenerate board_tables.json
+    """
+    with open(path, "w") as out:
+        json.dump(build(arena_size), out, separators=(",", ":"))
+
+
+def load(path=TABLES_PATH, arena_size=ARENA_SIZE):
+    """Reads the board tables written by write(), building them instead if the file is missing or stale
+
+    Returns:
+        A dict like build() returns
+
+    """
+    try:
+        with open(path) as tables_file:
+            tables = json.load(tables_file)
+        if tables.get("arena_size") == arena_size:
+            return tables
+    except (OSError, ValueError):
+        pass
+    return build(arena_size)
+
+
+_tables = load()
+ARENA_TILES = frozenset((x, y) for x, y in _tables["arena"])
+EDGES = tuple(tuple((x, y) for x, y in edge) for edge in _tables["edges"])
+
+
+@functools.lru_cache(maxsize=None)
+def range_offsets(radius, hit_radius):
+    """The (dx, dy) offsets of the tiles in range of a location, in the order GameMap.get_locations_in_range lists them
+
+    Args:
+        radius: The range
+        hit_radius: The config's getHitRadius, added to the range
+
+    """
+    search_radius = math.ceil(radius)
+    offsets = []
+    for dx in range(-search_radius, search_radius + 1):
+        for dy in range(-search_radius, search_radius + 1):
+            if math.sqrt(dx**2 + dy**2) < radius + hit_radius:
+                offsets.append((dx, dy))
+    return tuple(offsets)
+
+
+if __name__ == "__main__":
+    write()
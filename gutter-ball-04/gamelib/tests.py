@@ -1,10 +1,34 @@
 import unittest
 import json
+import io
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from unittest import mock
 from .game_state import GameState
 from .unit import GameUnit
+from .game_map import location_bit, locations_mask
+from .simulation import BatchSimulator
+from .scheduler import TurnScheduler
+from . import watchdog
+from .background import BackgroundWorker
+from . import reader
+from . import debug_log
+from . import replay
+from . import profiling
+from . import memory
+from . import tables
+from . import algocore
 
 class BasicTests(unittest.TestCase):
 
+    def tearDown(self):
+        # Discard whatever warnings the test left in the debug channel
+        with mock.patch("sys.stderr", new_callable=io.StringIO):
+            debug_log.channel.flush()
+
     def make_turn_0_map(self):
         config = """
             {
@@ -214,6 +238,7 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(2, game.attempt_spawn("SI", [[13, 0], [13, 0], [13, 5]]), "More or less than 2 units were spawned!")
         self.assertEqual([("DF", 13, 6)], game._build_stack, "Build queue is wrong!")
         self.assertEqual([("SI", 13, 0), ("SI", 13, 0), ("SI", 13, 0)], game._deploy_stack, "Deploy queue is wrong!")
+        self.assertEqual(True, game.can_spawn("SI", (14, 0)), "Edge locations given as tuples should be spawnable")
 
     def test_trivial_functions(self):
         game = self.make_turn_0_map()
@@ -235,6 +260,94 @@ class BasicTests(unittest.TestCase):
             game.game_map.add_unit("FF", [13,13])
         self.assertEqual(1, len(game.game_map[13,13]), "Towers seem to be stacking")
         
+    def test_structure_masks(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(0, game.game_map.structure_mask(), "The turn 0 map has no structures")
+        game.game_map.add_unit("FF", [13,13], 0)
+        game.game_map.add_unit("DF", [14,14], 1)
+        game.game_map.add_unit("PI", [12,13], 0)
+        self.assertEqual(location_bit([13,13]), game.game_map.structure_mask(0), "Mobile units should not be in the mask")
+        self.assertEqual(locations_mask([[13,13],[14,14]]), game.game_map.structure_mask(), "Both players should be in the mask")
+        game.attempt_upgrade([13,13])
+        self.assertEqual(location_bit([13,13]), game.game_map.upgraded_mask(), "Upgrades were not tracked")
+        game.game_map.remove_unit([13,13])
+        game.game_map[14,14] = []
+        self.assertEqual(0, game.game_map.structure_mask(), "Removed structures are still in the mask")
+        self.assertEqual(0, game.game_map.upgraded_mask(), "Removed upgrades are still in the mask")
+
+    def test_structures_to_repair(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13,13], 0)
+        game.game_map.add_unit("DF", [12,12], 0)
+        game.game_map.add_unit("DF", [14,14], 1)
+        game.game_map.add_unit("PI", [11,13], 0)
+        self.assertEqual(3, len(game.game_map.structures()), "Mobile units should not be indexed")
+        self.assertEqual(2, len(game.game_map.structures(0)), "Structures were indexed to the wrong player")
+        game.attempt_upgrade([[13,13],[12,12]])
+        self.assertEqual([], game.get_structures_to_repair(), "Healthy upgraded structures need no repair")
+        game.game_map[13,13][0].health = 1
+        game.game_map[12,12][0].health = game.game_map[12,12][0].max_health / 2
+        self.assertEqual([[13,13],[12,12]], [[unit.x, unit.y] for unit in game.get_structures_to_repair()], "The most damaged should come first")
+        self.assertEqual([[14,14]], [[unit.x, unit.y] for unit in game.get_structures_to_repair(player_index=1)], "Un-upgraded structures need repair")
+        game.game_map.remove_unit([13,13])
+        game.game_map[12,12] = []
+        self.assertEqual([], game.game_map.structures(0), "Removed structures are still indexed")
+
+    def test_zobrist_hash(self):
+        game = self.make_turn_0_map()
+        other = self.make_turn_0_map()
+        self.assertEqual(0, game.game_map.zobrist_hash(), "An empty board should hash to 0")
+        game.game_map.add_unit("FF", [13,13], 0)
+        game.game_map.add_unit("DF", [14,14], 1)
+        other.game_map.add_unit("DF", [14,14], 1)
+        other.game_map.add_unit("FF", [13,13], 0)
+        self.assertEqual(game.game_map.zobrist_hash(), other.game_map.zobrist_hash(), "The hash should not depend on build order")
+        self.assertEqual(game.state_key(), other.state_key(), "Equal states should have equal keys")
+        built = game.game_map.zobrist_hash()
+        game.game_map.add_unit("PI", [12,12], 0)
+        self.assertEqual(built, game.game_map.zobrist_hash(), "Mobile units should not be hashed")
+        game.attempt_upgrade([13,13])
+        self.assertNotEqual(built, game.game_map.zobrist_hash(), "Upgrades should change the hash")
+        self.assertNotEqual(game.state_key(), other.state_key(), "Resources should be part of the key")
+        other.attempt_upgrade([13,13])
+        self.assertEqual(game.state_key(), other.state_key(), "The same upgrade should give the same key")
+        other.game_map[14,14][0].health = 1
+        other.game_map.refresh_location([14,14])
+        self.assertNotEqual(game.game_map.zobrist_hash(), other.game_map.zobrist_hash(), "Health buckets should change the hash")
+        game.game_map.remove_unit([13,13])
+        game.game_map.remove_unit([14,14])
+        self.assertEqual(0, game.game_map.zobrist_hash(), "Removing everything should restore the empty hash")
+        state = json.loads(game.serialized_string)
+        state["p1Units"][0] = [[13, 13, 150.0, "1"]]
+        state["p1Units"].append([[13, 13, 150.0, "2"]])
+        state["p2Units"][2] = [[14, 14, 1.0, "3"]]
+        parsed = GameState(game.config, json.dumps(state))
+        self.assertEqual(other.game_map.zobrist_hash(), parsed.game_map.zobrist_hash(), "Parsing should hash the same board")
+
+    def test_board_tables(self):
+        self.assertEqual(tables.build(), tables.load(), "board_tables.json is out of date, run python -m gamelib.tables")
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(tables.build(), tables.load(os.path.join(directory, "missing.json")), "A missing file should be built instead")
+        self.assertEqual(420, len(tables.ARENA_TILES), "The diamond has 420 tiles")
+        game = self.make_turn_0_map()
+        self.assertEqual([[13,0],[12,1],[11,2]], game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)[:3], "Bottom left edge is wrong")
+        self.assertEqual(False, game.game_map.in_arena_bounds([0,0]), "Corners are off the board")
+
+    def test_warm_up_before_config(self):
+        events = []
+        class Algo(algocore.AlgoCore):
+            def warm_up(self):
+                time.sleep(0.05)
+                events.append("warm_up")
+            def on_game_start(self, config):
+                events.append("on_game_start")
+        algo = Algo()
+        algo.threaded_input = False
+        messages = ['{"replaySave": 0, "timingAndReplay": {}}', '{"turnInfo": [2, 0, 0]}']
+        with mock.patch.object(algocore, "get_command", side_effect=messages):
+            algo.start()
+        self.assertEqual(["warm_up", "on_game_start"], events, "on_game_start should wait for warm_up")
+
     def test_get_units_in_range(self):
         game = self.make_turn_0_map()
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
@@ -275,3 +388,293 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_project_resources(self):
+        game = self.make_turn_0_map()
+        projection = game.project_resources(12)
+        for turns in range(13):
+            self.assertAlmostEqual(game.project_future_MP(turns), projection[0][turns][game.MP], 5, "Without income MP should match project_future_MP")
+        self.assertEqual(projection[0], projection[1], "Both players start alike")
+        self.assertEqual(game.get_resource(game.SP) + 15, projection[0][3][game.SP], "SP should grow by coresPerRound")
+        game.game_map.add_unit("EF", [13,2], 0)
+        game.game_map.add_unit("EF", [14,2], 0)
+        game.attempt_upgrade([14,2])
+        self.assertEqual([2, 1], game.structure_income(0), "Supports generate SP, upgraded ones MP too")
+        self.assertEqual([0, 0], game.structure_income(1), "The enemy has no supports")
+        projection = game.project_resources(3)
+        self.assertEqual(projection[0][0][game.SP] + 21, projection[0][3][game.SP], "Support SP was not projected")
+        self.assertGreater(projection[0][3][game.MP], projection[1][3][game.MP], "Support MP was not projected")
+
+    def test_batch_simulation(self):
+        game = self.make_turn_0_map()
+        for location in [[25,16],[24,15],[23,15]]:
+            game.game_map.add_unit("DF", location, 1)
+        candidates = [[("PI", [13,0], 1)], [("PI", [13,0], 10)], [("SI", [13,0], 2)]]
+        result = BatchSimulator(game).simulate(candidates)
+        self.assertEqual((3, 2), result.breaches.shape, "There should be one row per candidate")
+        self.assertEqual(0, result.breaches[0, 0], "A lone scout should not survive three turrets")
+        self.assertEqual(9, result.breaches[1, 0], "A scout stack should mostly get through")
+        self.assertEqual(1, result.structures_destroyed[1, 1], "The scout stack should destroy a turret")
+        self.assertEqual(0, result.structure_damage[2, 1], "Interceptors should not damage structures")
+
+    def test_batch_simulation_candidate_structures(self):
+        game = self.make_turn_0_map()
+        candidates = [[], [("DF", [26,12], 1), ("DF", [25,11], 1), ("UP", [26,12], 1)]]
+        result = BatchSimulator(game).simulate(candidates, opponent=[("PI", [13,27], 1)])
+        self.assertEqual(1, result.breaches[0, 1], "An undefended corner should be breached")
+        self.assertEqual(0, result.breaches[1, 1], "Candidate turrets should only defend their own row")
+        self.assertEqual(0, len(game.game_map[26,12]), "Candidate structures should not leak onto the shared board")
+
+    def test_scheduler_skips_late_stages(self):
+        game = self.make_turn_0_map()
+        scheduler = TurnScheduler(budget=0.5, margin=0.1)
+        scheduler.add_stage("quick", lambda gs, results, deadline: 1, priority=2)
+        scheduler.add_stage("slow", lambda gs, results, deadline: 2, priority=1, estimate=10)
+        plan = lambda gs, results: gs.attempt_spawn("DF", [13,6])
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as out:
+            submitted = scheduler.run(game, lambda gs: None, plan)
+        self.assertEqual({"quick": 1}, scheduler.results, "Only the quick stage fits in the budget")
+        self.assertEqual(["slow"], scheduler.skipped, "The slow stage should have been skipped")
+        self.assertIs(game, submitted, "The real plan should have been submitted")
+        self.assertEqual('[["DF", 13, 6]]\n[]\n', out.getvalue(), "The plan was not submitted")
+
+    def test_scheduler_falls_back(self):
+        game = self.make_turn_0_map()
+        scheduler = TurnScheduler(budget=0.5)
+        def broken_plan(gs, results):
+            gs.attempt_spawn("FF", [13,6])
+            raise ValueError("bad plan")
+        fallback = lambda gs: gs.attempt_spawn("DF", [10,6])
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as out, mock.patch("sys.stderr", new_callable=io.StringIO):
+            scheduler.run(game, fallback, broken_plan)
+            self.assertEqual('[["DF", 10, 6]]\n[]\n', out.getvalue(), "A failed plan should submit the fallback")
+            out.truncate(0)
+            out.seek(0)
+            scheduler.run(game, fallback, lambda gs, results: None, start_time=time.perf_counter() - 1)
+            self.assertEqual('[["DF", 10, 6]]\n[]\n', out.getvalue(), "A late turn should submit the fallback")
+
+    def test_scheduler_survives_broken_fallback(self):
+        game = self.make_turn_0_map()
+        scheduler = TurnScheduler(budget=0.5)
+        scheduler.add_stage("quick", lambda gs, results, deadline: 1)
+        def broken_fallback(gs):
+            gs.attempt_spawn("DF", [10,6])
+            raise ValueError("bad fallback")
+        plan = lambda gs, results: gs.attempt_spawn("DF", [13,6])
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as out, mock.patch("sys.stderr", new_callable=io.StringIO):
+            scheduler.run(game, broken_fallback, plan)
+            self.assertEqual({"quick": 1}, scheduler.results, "Stages should still run")
+            self.assertEqual('[["DF", 13, 6]]\n[]\n', out.getvalue(), "The plan should still be submitted")
+            out.truncate(0)
+            out.seek(0)
+            scheduler.run(self.make_turn_0_map(), broken_fallback, plan, start_time=time.perf_counter() - 1)
+            self.assertEqual('[]\n[]\n', out.getvalue(), "A late turn should submit an empty plan, not half the fallback")
+
+    def test_watchdog_submits_committed_plan(self):
+        game = self.make_turn_0_map()
+        guard = watchdog.TurnWatchdog(limit=0.05)
+        guard.activate()
+        try:
+            with mock.patch("sys.stdout", new_callable=io.StringIO) as out, mock.patch("sys.stderr", new_callable=io.StringIO):
+                guard.start_turn()
+                game.attempt_spawn("DF", [13,6])
+                game.commit_plan()
+                game.attempt_spawn("DF", [10,6])
+                time.sleep(0.2)
+                self.assertEqual('[["DF", 13, 6]]\n[]\n', out.getvalue(), "The watchdog should send the committed plan")
+                game.submit_turn()
+                guard.finish_turn()
+                self.assertEqual('[["DF", 13, 6]]\n[]\n', out.getvalue(), "A turn should only be submitted once")
+        finally:
+            watchdog._active = None
+
+    def test_watchdog_fallback(self):
+        game = self.make_turn_0_map()
+        guard = watchdog.TurnWatchdog(limit=10)
+        guard.fallback = ([("DF", 3, 12)], [])
+        guard.activate()
+        try:
+            with mock.patch("sys.stdout", new_callable=io.StringIO) as out, mock.patch("sys.stderr", new_callable=io.StringIO):
+                guard.start_turn()
+                guard.finish_turn()
+                self.assertEqual('[["DF", 3, 12]]\n[]\n', out.getvalue(), "An unsubmitted turn should send the fallback")
+                out.truncate(0)
+                out.seek(0)
+                guard.start_turn()
+                game.submit_turn()
+                guard.finish_turn()
+                self.assertEqual('[]\n[]\n', out.getvalue(), "A submitted turn should not send the fallback")
+        finally:
+            watchdog._active = None
+
+    def test_background_worker_keeps_latest(self):
+        seen = []
+        worker = BackgroundWorker(lambda item: seen.append(item) or item * 2)
+        worker.pause()
+        for item in range(5):
+            worker.submit(item)
+        worker.resume()
+        for _ in range(100):
+            if worker.result() is not None:
+                break
+            time.sleep(0.01)
+        self.assertEqual([4], seen, "Only the newest item should be processed")
+        self.assertEqual(8, worker.result(), "The result should come from the newest item")
+        worker.clear()
+        self.assertEqual(None, worker.result(), "Clearing should drop the result")
+
+    def test_background_worker_checkpoint(self):
+        steps = []
+        paused = threading.Event()
+        def job(item):
+            for step in range(item):
+                if step == 3:
+                    paused.wait(1.0)
+                worker.checkpoint()
+                steps.append(step)
+            return len(steps)
+        worker = BackgroundWorker(job)
+        worker.submit(10)
+        for _ in range(100):
+            if len(steps) == 3:
+                break
+            time.sleep(0.01)
+        worker.pause()
+        paused.set()
+        time.sleep(0.1)
+        self.assertEqual([0, 1, 2], steps, "A paused job should wait at its next checkpoint")
+        worker.resume()
+        for _ in range(100):
+            if worker.result() is not None:
+                break
+            time.sleep(0.01)
+        self.assertEqual(10, worker.result(), "The job should finish once resumed")
+
+    def test_reader_classifies(self):
+        self.assertEqual(reader.CONFIG, reader.classify('{"timingAndReplay":{"replaySave":1}}'))
+        self.assertEqual(reader.TURN, reader.classify('{"p2Units":[],"turnInfo":[0,3,-1]}'))
+        self.assertEqual(reader.ACTION_FRAME, reader.classify('{"turnInfo":[1,3,12]}'))
+        self.assertEqual(reader.END, reader.classify('{"turnInfo":[2,3,-1]}'))
+        self.assertEqual(reader.UNKNOWN, reader.classify('hello'))
+
+    def test_reader_coalesces_frames(self):
+        frames = ['{{"turnInfo":[1,0,{}]}}\n'.format(i) for i in range(6)]
+        lines = ['{"replaySave":1}\n'] + frames + ['{"turnInfo":[0,1,-1]}\n'] + frames + ['{"turnInfo":[2,1,-1]}\n']
+        command_reader = reader.CommandReader(io.StringIO("".join(lines[:7])), max_frames=4)
+        command_reader.start()
+        command_reader._thread.join()
+        self.assertEqual(reader.CONFIG, command_reader.get()[0], "Config should come first")
+        self.assertEqual((reader.ACTION_FRAME, frames[5]), command_reader.get(), "Stale frames should be coalesced into the newest")
+        self.assertEqual(5, command_reader.dropped_frames, "Two frames over the limit and three coalesced")
+        with mock.patch("sys.stderr", new_callable=io.StringIO), self.assertRaises(SystemExit):
+            command_reader.get()
+
+        command_reader = reader.CommandReader(io.StringIO("".join(lines[7:])))
+        command_reader.start()
+        command_reader._thread.join()
+        self.assertEqual(reader.TURN, command_reader.get()[0], "Frames queued before a turn should be dropped")
+        self.assertEqual(reader.END, command_reader.get()[0], "The end message should never be dropped")
+
+    def test_debug_channel(self):
+        out = io.StringIO()
+        channel = debug_log.DebugChannel(level=debug_log.INFO, rate_limit=2, stream=out)
+        formatted = []
+        class Spy:
+            def __format__(self, spec):
+                formatted.append(spec)
+                return "spy"
+        channel.debug("hidden {}", Spy())
+        self.assertEqual([], formatted, "Messages below the level should never be formatted")
+        for i in range(5):
+            channel.warning("Could not spawn at {}", i)
+        self.assertEqual("", out.getvalue(), "Messages should be buffered until flushed")
+        channel.flush()
+        self.assertEqual("Could not spawn at 0\nCould not spawn at 1\n(3 more like: Could not spawn at {})\n", out.getvalue())
+
+        out = io.StringIO()
+        channel = debug_log.DebugChannel(immediate=True, stream=out)
+        channel.info("now")
+        self.assertEqual("now\n", out.getvalue(), "Immediate mode should write straight away")
+
+    def test_replay_round_trip(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            recorder = replay.ReplayRecorder(path)
+            recorder.record(replay.INBOUND, '{"turnInfo":[0,0,-1]}\n')
+            recorder.record_outbound('[["DF", 13, 6]]')
+            recorder.end_turn()
+            recorder.record(replay.INBOUND, '{"turnInfo":[1,0,0]}\n')
+            recorder.close()
+            with open(path, "ab") as log:
+                log.write(b"\x10\x00\x00\x00trunc")
+            records = list(replay.read_replay(path))
+        finally:
+            os.remove(path)
+        self.assertEqual([replay.INBOUND, replay.OUTBOUND, replay.INBOUND], [r[0] for r in records], "Directions were not kept")
+        self.assertEqual('[["DF", 13, 6]]', records[1][2], "Messages should round trip exactly")
+        self.assertTrue(records[0][1] <= records[2][1], "Timestamps should increase")
+
+    def test_replay_records_during_end_turn(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            recorder = replay.ReplayRecorder(path)
+            def reader_thread():
+                for i in range(5000):
+                    recorder.record(replay.INBOUND, str(i))
+            thread = threading.Thread(target=reader_thread)
+            thread.start()
+            while thread.is_alive():
+                recorder.end_turn()
+            thread.join()
+            recorder.close()
+            records = list(replay.read_replay(path))
+        finally:
+            os.remove(path)
+        self.assertEqual([str(i) for i in range(5000)], [r[2] for r in records], "Messages recorded during end_turn were lost")
+
+    def test_profiler_counts_and_restores(self):
+        original = GameState.find_path_to_edge
+        class Algo:
+            def on_turn(self, game_state_string):
+                return "done"
+            def on_action_frame(self, game_state_string):
+                pass
+        algo = Algo()
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = profiling.Profiler(slowest=1, directory=directory)
+            profiler.install(algo)
+            try:
+                game = self.make_turn_0_map()
+                game.find_path_to_edge([13, 0])
+                self.assertEqual("done", algo.on_turn(""), "Wrapped hooks should return what the hook returns")
+                algo.on_turn("")
+            finally:
+                profiler.uninstall()
+            paths = profiler.dump()
+            self.assertEqual(1, len(paths), "Only the slowest turn should be kept")
+            self.assertTrue(os.path.exists(paths[0]), "cProfile stats were not written")
+        self.assertEqual(2, profiler.timers["on_turn"][0], "on_turn calls were not counted")
+        self.assertEqual(1, profiler.timers["GameState.find_path_to_edge"][0], "find_path_to_edge calls were not counted")
+        self.assertEqual(1, profiler.timers["GameState.__init__"][0], "GameState construction was not counted")
+        self.assertIs(original, GameState.find_path_to_edge, "uninstall should restore GameState")
+        self.assertNotIn("on_turn", algo.__dict__, "uninstall should restore the algo")
+
+    def test_memory_report(self):
+        out = io.StringIO()
+        # Two turn reports fill a limit of two, the game end report must not count against it
+        channel = debug_log.DebugChannel(stream=out, rate_limit=2)
+        report = memory.MemoryReport(top=3)
+        report.start()
+        try:
+            report.end_turn(channel)
+            games = [self.make_turn_0_map() for _ in range(3)]
+            report.end_turn(channel)
+            self.assertTrue(report.live_objects()["GameState"] >= 3, "Live GameStates were not counted")
+        finally:
+            report.finish(channel)
+        channel.flush()
+        self.assertFalse(tracemalloc.is_tracing(), "finish should stop tracing")
+        self.assertEqual([1, 2], [turn for turn, _, _ in report.history], "Every turn should have been snapshot")
+        self.assertIn("game_map.py", out.getvalue(), "The maps the GameStates allocated should show up as growth")
+        self.assertIn("Largest allocation sites at game end", out.getvalue())
@@ -1,8 +1,15 @@
 import sys
+import threading
+
+from .debug_log import channel
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+# Held while writing a command, so lines from the turn watchdog thread never interleave
+_command_lock = threading.RLock()
+_command_listeners = []
+
 
 def get_command():
     """Gets input from stdin
@@ -26,16 +33,32 @@ def send_command(cmd):
     Should usually only be called by 'GameState.submit_turn()'
 
     """
-    sys.stdout.write(cmd.strip() + "\n")
-    sys.stdout.flush()
+    with _command_lock:
+        sys.stdout.write(cmd.strip() + "\n")
+        sys.stdout.flush()
+        for listener in _command_listeners:
+            listener(cmd.strip())
+
+def add_command_listener(listener):
+    """Calls listener(cmd) with every command sent to the engine, e.g. to record them
+
+    """
+    with _command_lock:
+        _command_listeners.append(listener)
+
+def remove_command_listener(listener):
+    with _command_lock:
+        _command_listeners.remove(listener)
 
 def debug_write(*msg):
     """Prints a message to the games debug output
 
+    Messages go through the buffered debug channel in debug_log.py, which AlgoCore flushes
+    once per turn. Set the ALGO_DEBUG environment variable to print them immediately.
+
     Args:
         msg: The message to output
 
     """
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
-    sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
-    sys.stderr.flush()
+    channel.info(", ".join(map(str, msg)).strip())
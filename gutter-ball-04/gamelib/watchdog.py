@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+from .util import send_command, debug_write
+
+_active = None
+
+
+def current_watchdog():
+    """The watchdog guarding the running algo's turns, or None if there is none
+    """
+    return _active
+
+
+class TurnWatchdog:
+    """Guarantees the two command lines of a turn are sent before a time limit.
+
+    The watchdog is armed when a turn message arrives. Strategies commit plans as they
+    improve them with GameState.commit_plan(), and GameState.submit_turn() sends through
+    the watchdog. If nothing has been submitted when the limit is reached, a background
+    thread sends the best committed plan, or the fallback plan if nothing was committed.
+    Exactly one plan is sent per turn, whichever thread gets there first.
+
+    Attributes :
+        * limit (float): Seconds after the turn message arrives at which the watchdog submits
+        * fallback (tuple): (build_stack, deploy_stack) sent when no plan was committed
+
+    """
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.fallback = ([], [])
+        self._lock = threading.Condition()
+        self._deadline = None
+        self._submitted = True
+        self._committed = None
+        self._thread = None
+
+    def activate(self):
+        """Makes this the watchdog GameState.submit_turn() and GameState.commit_plan() report to
+        """
+        global _active
+        _active = self
+
+    def start_turn(self, start_time=None):
+        """Arms the watchdog for a new turn
+
+        Args:
+            start_time: The time.perf_counter() value the turn message arrived at, now if None
+
+        """
+        start_time = time.perf_counter() if start_time is None else start_time
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="turn-watchdog", daemon=True)
+                self._thread.start()
+            self._deadline = start_time + self.limit
+            self._submitted = False
+            self._committed = None
+            self._lock.notify()
+
+    def commit(self, build_stack, deploy_stack):
+        """Records the best plan so far, to be sent if the turn runs out of time
+        """
+        with self._lock:
+            self._committed = (list(build_stack), list(deploy_stack))
+
+    def submit(self, build_stack, deploy_stack):
+        """Sends the plan unless this turn was already submitted
+
+        Returns:
+            True if the plan was sent, False if the turn had already been submitted
+
+        """
+        with self._lock:
+            if self._submitted:
+                return False
+            self._send(build_stack, deploy_stack)
+            return True
+
+    def finish_turn(self):
+        """Disarms the watchdog once on_turn has returned, submitting the best plan if nothing was sent
+        """
+        with self._lock:
+            if not self._submitted:
+                debug_write("Turn ended without a submission, sending the best committed plan")
+                self._send(*self._best_plan())
+            self._deadline = None
+
+    def _best_plan(self):
+        return self._committed if self._committed is not None else self.fallback
+
+    def _send(self, build_stack, deploy_stack):
+        send_command(json.dumps(build_stack))
+        send_command(json.dumps(deploy_stack))
+        self._submitted = True
+
+    def _run(self):
+        with self._lock:
+            while True:
+                if self._deadline is None or self._submitted:
+                    self._lock.wait()
+                    continue
+                remaining = self._deadline - time.perf_counter()
+                if remaining > 0:
+                    self._lock.wait(remaining)
+                    continue
+                debug_write("Turn time limit of {}s reached, sending the best committed plan".format(self.limit))
+                self._send(*self._best_plan())
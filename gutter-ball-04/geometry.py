@@ -0,0 +1,90 @@
+import functools
+
+from gamelib.game_map import location_bit
+
+"""
+Board geometry for hardcoded layouts: lines, mirrors, shifts and regions.
+Every shape is an immutable tuple of (x,y) tuples, memoized on its arguments, so a layout
+costs nothing after the first time it is built and can be shared freely. gamelib takes
+tuples anywhere it takes [x,y] lists. indices() and mask() give the same shape as flat
+indices and board masks (bit x+28*y).
+"""
+
+ARENA_SIZE = 28
+
+
+def as_locations(locs):
+    #a tuple of (x,y) tuples, from one location or any sequence of them.
+    if(len(locs) > 0 and type(locs[0]) == int):
+        locs = [locs]
+    return tuple((loc[0], loc[1]) for loc in locs)
+
+
+@functools.lru_cache(maxsize=None)
+def _line(start, end):
+    dx = end[0]-start[0]
+    dy = end[1]-start[1]
+    if(abs(dx)>=abs(dy)):
+        #then we should do the stepping in x.
+        stepsign = 1 if dx>=0 else -1
+        return tuple((start[0] + step*stepsign, int(round(dy * step / abs(dx) + start[1]))) for step in range(0,abs(dx)+1))
+    #then we should do the stepping in y:
+    stepsign = 1 if dy>=0 else -1
+    return tuple((int(round(dx * step / abs(dy) + start[0])), start[1] + step*stepsign) for step in range(0,abs(dy)+1))
+
+
+def line(loc1, loc2):
+    """
+    The tiles on the straight line from loc1 to loc2, both ends included, stepping along
+    whichever axis is longer.
+    """
+    return _line((loc1[0], loc1[1]), (loc2[0], loc2[1]))
+
+
+@functools.lru_cache(maxsize=None)
+def _mirror(locs):
+    return tuple((ARENA_SIZE - x - 1, y) for x, y in locs)
+
+
+def mirror(locs):
+    #reflected left to right across the middle of the board.
+    return _mirror(as_locations(locs))
+
+
+@functools.lru_cache(maxsize=None)
+def _shift(locs, dx, dy):
+    return tuple((x + dx, y + dy) for x, y in locs)
+
+
+def shift(locs, dx, dy):
+    return _shift(as_locations(locs), dx, dy)
+
+
+def region(*parts):
+    """
+    The parts joined in order, e.g. region(line(a,b), line(b,c), [[3,4]]). Tiles shared by
+    two parts appear twice, as they would in a list of build orders.
+    """
+    return tuple(loc for part in parts for loc in as_locations(part))
+
+
+@functools.lru_cache(maxsize=None)
+def _indices(locs):
+    return tuple(x + ARENA_SIZE*y for x, y in locs)
+
+
+def indices(locs):
+    #flat board indices x+28*y, the bit numbers of location_bit.
+    return _indices(as_locations(locs))
+
+
+@functools.lru_cache(maxsize=None)
+def _mask(locs):
+    mask = 0
+    for loc in locs:
+        mask |= location_bit(loc)
+    return mask
+
+
+def mask(locs):
+    return _mask(as_locations(locs))
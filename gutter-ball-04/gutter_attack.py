@@ -1,19 +1,22 @@
-from attackbase import AttackBase 
+from attackbase import AttackBase, BoardContext
 from algo_util import * 
+import geometry
+from gamelib.game_map import location_bit
 
 class GutterAttack(AttackBase):
     LEFT = 0
     RIGHT = 1
-    LEFT_GUTTER_WALL =build_diagonal([14,2],[3,13]) +\
-        build_diagonal([14,2],[16,4]) + build_diagonal([16,4],[18,4])
-    LEFT_GUTTER_PATH = build_diagonal([14,0],[17,3]) + build_diagonal([13,0],[1,12]) 
-    LEFT_GUTTER_PATH = LEFT_GUTTER_PATH + [[loc[0],loc[1]+1] for loc in LEFT_GUTTER_PATH]
-    LEFT_SCOUT_SPAWNS = [[17,3],[12,1]]
-    LEFT_SCORING_SCOUT_SPAWN = [[17,3]]
-    LEFT_DEST_SPAWN = [[8,5]]
-    LEFT_BONUS_BUFF_REGION = [[13,2]]
+    #layouts are geometry tuples, built once and shared by every instance.
+    LEFT_GUTTER_WALL = geometry.region(geometry.line([14,2],[3,13]),
+        geometry.line([14,2],[16,4]), geometry.line([16,4],[18,4]))
+    LEFT_GUTTER_PATH = geometry.region(geometry.line([14,0],[17,3]), geometry.line([13,0],[1,12]))
+    LEFT_GUTTER_PATH = geometry.region(LEFT_GUTTER_PATH, geometry.shift(LEFT_GUTTER_PATH,0,1))
+    LEFT_SCOUT_SPAWNS = ((17,3),(12,1))
+    LEFT_SCORING_SCOUT_SPAWN = ((17,3),)
+    LEFT_DEST_SPAWN = ((8,5),)
+    LEFT_BONUS_BUFF_REGION = ((13,2),)
 
-    CENTRAL_BUFF_REGION = build_diagonal([13,7],[14,7])
+    CENTRAL_BUFF_REGION = geometry.line([13,7],[14,7])
 
     def __init__(self, config, mirror = False,addDemo = False):
         self.config = config
@@ -35,38 +38,37 @@ class GutterAttack(AttackBase):
         self.destspawn = GutterAttack.LEFT_DEST_SPAWN
         self.scoringscoutspawn = GutterAttack.LEFT_SCORING_SCOUT_SPAWN
         if(mirror):
-            self.path = mirror_symmetry(self.path)
-            self.wallpath = mirror_symmetry(self.wallpath)
-            self.scoutspawns = mirror_symmetry(self.scoutspawns)
-            self.destspawn = mirror_symmetry(self.destspawn)
-            self.scoringscoutspawn = mirror_symmetry(self.scoringscoutspawn)
+            self.path = geometry.mirror(self.path)
+            self.wallpath = geometry.mirror(self.wallpath)
+            self.scoutspawns = geometry.mirror(self.scoutspawns)
+            self.destspawn = geometry.mirror(self.destspawn)
+            self.scoringscoutspawn = geometry.mirror(self.scoringscoutspawn)
+        self.compileTemplate()
 
-    def attackPossible(self,game_state):
-        gs = game_state 
+    def compileTemplate(self):
+        #board masks (bit x+28*y) of the footprints, so attackPossible is a handful of bitwise ops.
+        self.path_mask = geometry.mask(self.path)
+        self.buff_mask = geometry.mask(GutterAttack.CENTRAL_BUFF_REGION)
+        self.wall_mask = geometry.mask(self.wallpath)
+        #the diagonals share their end tiles, which have always been costed twice.
+        self.wall_repeat_mask = geometry.mask([loc for i,loc in enumerate(self.wallpath) if loc in self.wallpath[:i]])
+        self.wall_bits = [location_bit(loc) for loc in self.wallpath]
+
+    def attackPossible(self,game_state,context=None):
+        ctx = context or BoardContext(game_state)
         possible = True
         SPcost = 0
         MPcost = 0
-        
 
         #first, check if the walking path is clear.
-        for loc in self.path: 
-            if(not (gs.contains_stationary_unit(loc) is False)):
-                return (False,0,0)
+        if(ctx.blocked(self.path_mask)):
+            return (False,0,0)
         
         #then, how much would it cost to build the up the attack? 
-        #first, the essential "buffs"
-        for loc in GutterAttack.CENTRAL_BUFF_REGION:
-            unit = gs.contains_stationary_unit(loc)
-            if(unit is False):
-                SPcost+= gs.type_cost(SUPPORT,False)[0]
-                SPcost+= gs.type_cost(SUPPORT,True)[0]
-            elif(not unit.upgraded):
-                SPcost+= gs.type_cost(SUPPORT,True)[0]
-        #then, how much would it cost to build the wall?
-        for loc in self.wallpath:
-            unit = gs.contains_stationary_unit(loc)
-            if(unit is False):
-                SPcost+=gs.type_cost(WALL,False)[0]
+        #first, the essential "buffs", which every attack in the suite shares.
+        SPcost += ctx.memo(('buff cost',self.buff_mask),lambda: self.buffCost(ctx))
+        #then, the wall's cost, shared by the scout and demolisher variants of a side.
+        SPcost += ctx.memo(('wall cost',self.wall_mask,self.wall_repeat_mask),lambda: self.wallCost(ctx))
 
         #finally, for this version, just use:
         if(self.demolishers):
@@ -74,24 +76,31 @@ class GutterAttack(AttackBase):
         else: 
             MPcost = 16
         #can we afford it, now that all is said and done? 
-        possible = gs.get_resource(MP) >= MPcost and gs.get_resource(SP)>=SPcost
+        SPheld = ctx.SP
+        possible = ctx.MP >= MPcost and SPheld>=SPcost
         
         #if we have surplus structure supplies 
         self.bonus_towers = 0 #storing how many wall segments we can convert into supports!
         self.bonus_tower_spots = []
         wall_seg_index = 0
-        while(possible and SPcost > gs.get_resource(SP) - 6 and wall_seg_index < len(self.wallpath)): 
+        while(possible and SPcost > SPheld - 6 and wall_seg_index < len(self.wallpath)): 
             #then maybe we should convert some of our structure points into extra supports, using the wall path. 
             #search for a spot along the wall path that is clear, and add it to the self.bonus_towers... 
-            site = self.wallpath[wall_seg_index]
-            unit = gs.contains_stationary_unit(site)
-            if(unit is False):
+            if(not ctx.structures & self.wall_bits[wall_seg_index]):
                 self.bonus_towers+=1
-                self.bonus_tower_spots+=[site]
-            SPcost += gs.type_cost(SUPPORT,False)[0]
+                self.bonus_tower_spots+=[self.wallpath[wall_seg_index]]
+            SPcost += ctx.cost(SUPPORT)[0]
             wall_seg_index+=1
 
         return (possible, SPcost,MPcost)
+
+    def buffCost(self, ctx):
+        #build and upgrade the empty tiles, upgrade the rest.
+        support, upgrade = ctx.cost(SUPPORT)[0], ctx.cost(SUPPORT,True)[0]
+        return popcount(ctx.empty(self.buff_mask))*(support+upgrade) + popcount(ctx.unupgraded(self.buff_mask))*upgrade
+
+    def wallCost(self, ctx):
+        return (popcount(ctx.empty(self.wall_mask)) + popcount(ctx.empty(self.wall_repeat_mask))) * ctx.cost(WALL)[0]
     
     def reservedSquares(self):
         return self.path 
@@ -0,0 +1,228 @@
+import time
+
+from gamelib import tables
+
+"""
+Plans walls on our half that make the enemy's paths long and keep them under our turrets.
+
+Paths are predicted with a breadth first search back from each target edge over a flat
+board (index x+28*y), so one search scores every enemy spawn at once: a spawn's path is
+as long as its distance to the edge, and the damage along it is summed while searching.
+As in the engine, a spawn whose pocket of open tiles does not touch its target edge heads
+for the pocket's most ideal tile instead, the deepest one towards the edge, so walls still
+count once our half is sealed. Ties between equally short paths are broken by search order
+rather than the engine's rules, so this is a fast estimate, not a replacement for
+find_path_to_edge.
+
+Candidate walls are evaluated by blocking one tile, searching and unblocking it. Only
+tiles on a predicted path can change the score, as a wall anywhere else leaves every
+path as short as it was, so only those are tried.
+"""
+
+SIZE = tables.ARENA_SIZE
+TILES = SIZE * SIZE
+ON_BOARD = [False]*TILES
+for _x, _y in tables.ARENA_TILES:
+    ON_BOARD[_x + SIZE*_y] = True
+NEIGHBOURS = [tuple(n for n in (i-1 if i % SIZE else -1, i+1 if (i+1) % SIZE else -1, i-SIZE, i+SIZE)
+                    if 0 <= n < TILES and ON_BOARD[n]) if ON_BOARD[i] else () for i in range(TILES)]
+TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT = [tuple(x + SIZE*y for x, y in edge) for edge in tables.EDGES]
+#each edge's units head for the opposite one.
+TARGET = {TOP_RIGHT: BOTTOM_LEFT, TOP_LEFT: BOTTOM_RIGHT, BOTTOM_LEFT: TOP_RIGHT, BOTTOM_RIGHT: TOP_LEFT}
+
+
+def _index(location):
+    return location[0] + SIZE*location[1]
+
+
+def _idealness(i, target):
+    #how much a unit heading for target wants to end on tile i, as ShortestPathFinder._get_idealness.
+    x, y = i % SIZE, i // SIZE
+    edge_x, edge_y = target[0] % SIZE, target[0] // SIZE
+    return SIZE*(y if edge_y >= SIZE//2 else SIZE-1-y) + (x if edge_x >= SIZE//2 else SIZE-1-x)
+
+
+class PathEvaluator(object):
+    """
+    The board as a blocked bytearray, for scoring walls one tile at a time.
+    damage[i] is our turrets' damage per frame on tile i.
+    """
+    def __init__(self, game_state, damage):
+        mask = game_state.game_map.structure_mask()
+        self.blocked = bytearray((mask >> i) & 1 for i in range(TILES))
+        self.damage = damage
+
+    def search(self, seeds):
+        """
+        Distance to the nearest seed, damage summed along the way and the next tile towards
+        it, for every tile that can reach one (distance -1 if it cannot).
+        """
+        blocked, damage = self.blocked, self.damage
+        dist = [-1]*TILES
+        cover = [0.0]*TILES
+        parent = [-1]*TILES
+        queue = []
+        for seed in seeds:
+            if(not blocked[seed] and dist[seed] < 0):
+                dist[seed] = 0
+                cover[seed] = damage[seed]
+                queue.append(seed)
+        for i in queue:
+            step, covered = dist[i] + 1, cover[i]
+            for n in NEIGHBOURS[i]:
+                if(dist[n] < 0 and not blocked[n]):
+                    dist[n] = step
+                    cover[n] = covered + damage[n]
+                    parent[n] = i
+                    queue.append(n)
+        return dist, cover, parent
+
+    def _most_ideal(self, start, target, pockets):
+        #the most ideal open tile in start's pocket, recorded in pockets for every tile of it.
+        blocked = self.blocked
+        best, best_idealness = start, _idealness(start, target)
+        pocket = [start]
+        pockets[start] = None
+        for i in pocket:
+            for n in NEIGHBOURS[i]:
+                if(n not in pockets and not blocked[n]):
+                    pockets[n] = None
+                    pocket.append(n)
+                    idealness = _idealness(n, target)
+                    if(idealness > best_idealness):
+                        best, best_idealness = n, idealness
+        for i in pocket:
+            pockets[i] = best
+        return best
+
+    def routes(self, starts):
+        """
+        (start, dist, cover, parent) for every enemy start that is not blocked, following the
+        engine: to the target edge if the start's pocket touches it, else to the pocket's most
+        ideal tile. parent leads from the start along its path.
+        """
+        for edge in (TOP_LEFT, TOP_RIGHT):
+            dist, cover, parent = self.search(TARGET[edge])
+            stranded = {}
+            pockets = {}
+            for start in starts[edge]:
+                if(dist[start] >= 0):
+                    yield start, dist[start], cover[start], parent
+                elif(not self.blocked[start]):
+                    tile = pockets[start] if start in pockets else self._most_ideal(start, TARGET[edge], pockets)
+                    stranded.setdefault(tile, []).append(start)
+            for tile, group in stranded.items():
+                dist, cover, parent = self.search((tile,))
+                for start in group:
+                    yield start, dist[start], cover[start], parent
+
+    def score(self, starts, turret_weight):
+        #summed path length plus weighted damage taken, over every enemy start.
+        total = 0.0
+        for _, dist, cover, _ in self.routes(starts):
+            total += dist + turret_weight*cover
+        return total
+
+    def score_with(self, tile, starts, turret_weight):
+        #the score with a wall on tile, leaving the board as it was.
+        self.blocked[tile] = 1
+        try:
+            return self.score(starts, turret_weight)
+        finally:
+            self.blocked[tile] = 0
+
+    def path_tiles(self, starts):
+        #every tile on a predicted enemy path.
+        tiles = set()
+        for start, _, _, parent in self.routes(starts):
+            i = start
+            while(i >= 0):
+                tiles.add(i)
+                i = parent[i]
+        return tiles
+
+    def reachable(self, starts):
+        #the starts that can still reach their target edge.
+        reached = set()
+        for edge, edge_starts in starts.items():
+            dist, _, _ = self.search(TARGET[edge])
+            reached.update(start for start in edge_starts if dist[start] >= 0)
+        return reached
+
+
+class MazePlanner(object):
+    """
+    Greedy wall placement: each round adds the wall that raises the path score the most,
+    as long as every one of our edge spawns that can reach the enemy's edge still can,
+    until the budget, max_evaluations or time_limit (seconds) runs out.
+    turret_weight is how many tiles of extra path one point of damage per frame is worth.
+    """
+    def __init__(self, config, turret_weight=0.2, max_evaluations=400, time_limit=0.1, owner='defence'):
+        self.config = config
+        self.turret_weight = turret_weight
+        self.max_evaluations = max_evaluations
+        self.time_limit = time_limit
+        self.owner = owner
+        self.wall_type = config["unitInformation"][0]["shorthand"]
+
+    def _damage(self, game_state):
+        damage = [0.0]*TILES
+        for unit in game_state.game_map.structures(0):
+            if(unit.damage_i > 0):
+                for location in game_state.game_map.get_locations_in_range([unit.x, unit.y], unit.attackRange):
+                    damage[_index(location)] += unit.damage_i
+        return damage
+
+    def _starts(self, evaluator, edges):
+        return dict((edge, [i for i in edge if not evaluator.blocked[i]]) for edge in edges)
+
+    def plan(self, game_state, budget, reservations=None):
+        """
+        Walls to build with at most budget SP, in the order they were chosen.
+        Tiles reserved by anyone else are left alone.
+        """
+        deadline = time.perf_counter() + self.time_limit
+        cost = game_state.type_cost(self.wall_type)[0]
+        evaluator = PathEvaluator(game_state, self._damage(game_state))
+        enemy_starts = self._starts(evaluator, (TOP_LEFT, TOP_RIGHT))
+        own_starts = self._starts(evaluator, (BOTTOM_LEFT, BOTTOM_RIGHT))
+        own_tiles = set(BOTTOM_LEFT + BOTTOM_RIGHT)
+        must_reach = evaluator.reachable(own_starts)
+        best_score = evaluator.score(enemy_starts, self.turret_weight)
+        walls = []
+        evaluations = 0
+        rejected = set()
+        while(budget >= cost and cost > 0):
+            candidates = []
+            for i in evaluator.path_tiles(enemy_starts):
+                x, y = i % SIZE, i // SIZE
+                if(y >= SIZE//2 or i in own_tiles or i in rejected or evaluator.blocked[i]):
+                    continue
+                if(len(game_state.game_map[x, y]) > 0 or (reservations is not None and reservations.reserved([x, y], self.owner))):
+                    continue
+                candidates.append(i)
+            best = None
+            for i in sorted(candidates):
+                if(evaluations >= self.max_evaluations or time.perf_counter() > deadline):
+                    break
+                evaluations += 1
+                score = evaluator.score_with(i, enemy_starts, self.turret_weight)
+                if(score > best_score and (best is None or score > best[0])):
+                    best = (score, i)
+            if(best is None):
+                break
+            evaluator.blocked[best[1]] = 1
+            if(not must_reach <= evaluator.reachable(own_starts)):
+                #it would cut off one of our spawns.
+                evaluator.blocked[best[1]] = 0
+                rejected.add(best[1])
+                continue
+            best_score = best[0]
+            walls.append([best[1] % SIZE, best[1] // SIZE])
+            budget -= cost
+        return walls
+
+    def apply(self, game_state, walls):
+        if(len(walls) == 0):
+            return 0
+        return game_state.attempt_spawn(self.wall_type, walls)
@@ -0,0 +1,180 @@
+import heapq
+import math
+
+"""
+Spends spare SP on the structures worth most to our defence, instead of a fixed build order.
+
+Defence value is threat coverage of the enemy's likely paths: every tile an enemy path
+crosses is weighted by how many paths cross it, and is worth w*(1-exp(-d/saturation))
+for the turret damage d covering it, so piling turrets onto one tile stops paying off.
+Supports that generate MP when upgraded are worth a flat support_value per MP a turn.
+Candidates on tiles reserved by someone else lose reserved_penalty.
+
+New turrets and supports are always built and upgraded in one go, and costed as such:
+repair_simple_defences removes unupgraded structures, so a spawn alone would be refunded
+at a loss on the next turn.
+
+Picking is lazy greedy by value per SP: coverage gains only shrink as more turrets are
+placed, so a candidate whose re-scored ratio still beats the next best is the best pick.
+"""
+
+SPAWN = 'spawn'
+UPGRADE = 'upgrade'
+
+
+class PlacementOptimizer(object):
+    """
+    config is the game config. Call plan() for the spawns and upgrades to make with a budget,
+    and apply() to make them. purchases() gives the same choices with their costs and values.
+    """
+    def __init__(self, config, saturation=15.0, support_value=6.0, reserved_penalty=math.inf, owner='defence'):
+        self.config = config
+        self.saturation = saturation
+        self.support_value = support_value
+        self.reserved_penalty = reserved_penalty
+        self.owner = owner
+        units = config["unitInformation"]
+        self.turret_type = units[2]["shorthand"]
+        self.support_type = units[1]["shorthand"]
+        turret = units[2]
+        upgraded = dict(turret, **turret.get("upgrade", {}))
+        #(damage, range) before and after upgrading.
+        self.turret_stats = [(turret.get("attackDamageWalker", 0), turret.get("attackRange", 0)),
+                             (upgraded.get("attackDamageWalker", 0), upgraded.get("attackRange", 0))]
+        self.support_income = units[1].get("upgrade", {}).get("generatesResource2", 0)
+
+    def path_weights(self, enemy_paths):
+        #tile -> number of enemy paths crossing it.
+        weights = {}
+        for path in enemy_paths.values():
+            if(path is None):
+                continue
+            for tile in set((loc[0], loc[1]) for loc in path):
+                weights[tile] = weights.get(tile, 0) + 1
+        return weights
+
+    def _in_range(self, game_state, location, attack_range):
+        return [(x, y) for x, y in game_state.game_map.get_locations_in_range(list(location), attack_range)]
+
+    def _coverage(self, weights, damage, tiles):
+        #value of adding damage at each (tile, extra damage).
+        total = 0.0
+        for tile, extra in tiles:
+            weight = weights.get(tile)
+            if(weight):
+                before = damage.get(tile, 0.0)
+                total += weight * (math.exp(-before/self.saturation) - math.exp(-(before+extra)/self.saturation))
+        return total
+
+    def _turret_change(self, game_state, location, old, new):
+        #(tile, extra damage) pairs for a turret going from old to new (damage, range) stats.
+        old_tiles = set(self._in_range(game_state, location, old[1])) if old else set()
+        changes = []
+        for tile in self._in_range(game_state, location, new[1]):
+            changes.append((tile, new[0] - (old[0] if tile in old_tiles else 0)))
+        return changes
+
+    def _own_damage(self, game_state):
+        damage = {}
+        for unit in game_state.game_map.structures(0):
+            if(unit.damage_i > 0):
+                for tile in self._in_range(game_state, [unit.x, unit.y], unit.attackRange):
+                    damage[tile] = damage.get(tile, 0.0) + unit.damage_i
+        return damage
+
+    def _candidates(self, game_state, support_sites):
+        #(action, unit type, location, cost, turret stats change or None)
+        gm = game_state.game_map
+        spawn, upgrade = game_state.type_cost(self.turret_type)[0], game_state.type_cost(self.turret_type, True)[0]
+        candidates = []
+        for x in range(28):
+            for y in range(14):
+                if(not gm.in_arena_bounds([x, y])):
+                    continue
+                unit = game_state.contains_stationary_unit([x, y])
+                if(unit is False):
+                    if(len(gm[x, y]) == 0):
+                        candidates.append((SPAWN, self.turret_type, (x, y), spawn + upgrade, (None, self.turret_stats[1])))
+                elif(unit.player_index == 0 and unit.unit_type == self.turret_type and not unit.upgraded):
+                    candidates.append((UPGRADE, self.turret_type, (x, y), upgrade, (self.turret_stats[0], self.turret_stats[1])))
+        if(self.support_income > 0):
+            support, support_upgrade = game_state.type_cost(self.support_type)[0], game_state.type_cost(self.support_type, True)[0]
+            for location in support_sites:
+                unit = game_state.contains_stationary_unit(location)
+                if(unit is False and len(gm[location[0], location[1]]) == 0):
+                    candidates.append((SPAWN, self.support_type, tuple(location), support + support_upgrade, None))
+                elif(unit and unit.player_index == 0 and unit.unit_type == self.support_type and not unit.upgraded):
+                    candidates.append((UPGRADE, self.support_type, tuple(location), support_upgrade, None))
+        return candidates
+
+    def _value(self, game_state, candidate, weights, damage, reservations):
+        action, unit_type, location, cost, stats = candidate
+        if(stats is None):
+            value = self.support_value * self.support_income
+        else:
+            value = self._coverage(weights, damage, self._turret_change(game_state, location, *stats))
+        if(reservations is not None and reservations.reserved(location, self.owner)):
+            value -= self.reserved_penalty
+        return value
+
+    def purchases(self, game_state, budget, enemy_paths=None, reservations=None, support_sites=()):
+        """
+        The purchases plan() would make, as (SP cost, value, actions) in the order chosen,
+        for weighing them against saving up.
+        """
+        weights = self.path_weights(enemy_paths or {})
+        damage = self._own_damage(game_state) if weights else {}
+        heap = []
+        candidates = self._candidates(game_state, support_sites)
+        for index, candidate in enumerate(candidates):
+            if(candidate[3] <= budget):
+                value = self._value(game_state, candidate, weights, damage, reservations)
+                if(value > 0):
+                    heapq.heappush(heap, (-value/candidate[3], index, candidate))
+        purchases = []
+        index = len(candidates)
+        while(heap and budget > 0):
+            _, _, candidate = heapq.heappop(heap)
+            action, unit_type, location, cost, stats = candidate
+            if(cost > budget):
+                continue
+            value = self._value(game_state, candidate, weights, damage, reservations)
+            if(value <= 0):
+                continue
+            if(heap and value/cost < -heap[0][0]):
+                #it was worth less than it looked, so queue it behind the new leader.
+                heapq.heappush(heap, (-value/cost, index, candidate))
+                index += 1
+                continue
+            budget -= cost
+            actions = [(action, unit_type, location)]
+            if(action == SPAWN):
+                actions.append((UPGRADE, unit_type, location))
+            purchases.append((cost, value, actions))
+            if(stats is not None):
+                for tile, extra in self._turret_change(game_state, location, *stats):
+                    damage[tile] = damage.get(tile, 0.0) + extra
+        return purchases
+
+    def plan(self, game_state, budget, enemy_paths=None, reservations=None, support_sites=()):
+        """
+        Chooses the spawns and upgrades worth most for at most budget SP.
+
+        enemy_paths is BoardAnalysis.enemy_paths, without it only supports are valued.
+        support_sites are the tiles supports may go on.
+        Returns a list of (SPAWN or UPGRADE, unit type, location) in the order to make them,
+        every SPAWN followed by the UPGRADE of the same location.
+        """
+        return [step for _, _, actions in self.purchases(game_state, budget, enemy_paths, reservations, support_sites) for step in actions]
+
+    def apply(self, game_state, plan):
+        """
+        Makes the planned spawns and upgrades, returns how many succeeded.
+        """
+        total = 0
+        for action, unit_type, location in plan:
+            if(action == SPAWN):
+                total += game_state.attempt_spawn(unit_type, location)
+            else:
+                total += game_state.attempt_upgrade(location)
+        return total
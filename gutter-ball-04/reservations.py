@@ -0,0 +1,59 @@
+from gamelib.game_map import location_bit, locations_mask
+
+"""
+Tiles claimed for the current turn, so attacks, defences and repairs can plan around
+each other. Every owner's claims are kept as a board mask (bit x+28*y), so checking a
+tile is a single bit test however many tiles are claimed.
+"""
+
+
+class TileReservations(object):
+    """
+    owner is any hashable tag, e.g. 'attack', 'defence' or 'repair'. A tile can be claimed by
+    more than one owner, and an owner is never blocked by its own claims.
+    """
+    def __init__(self):
+        self.masks = {}
+        self.claimed = 0
+
+    def clear(self):
+        self.masks = {}
+        self.claimed = 0
+
+    def claim(self, owner, locations):
+        self.masks[owner] = self.masks.get(owner, 0) | locations_mask(locations)
+        self.claimed |= self.masks[owner]
+
+    def release(self, owner):
+        self.masks.pop(owner, None)
+        self.claimed = 0
+        for mask in self.masks.values():
+            self.claimed |= mask
+
+    def _others(self, owner):
+        #the tiles claimed by anyone other than owner, including tiles owner shares with them.
+        if(owner is None or owner not in self.masks):
+            return self.claimed
+        mask = 0
+        for other, other_mask in self.masks.items():
+            if(other != owner):
+                mask |= other_mask
+        return mask
+
+    def reserved(self, location, owner=None):
+        #is the tile claimed by anyone other than owner?
+        bit = location_bit(location)
+        if(not self.claimed & bit):
+            return False
+        return (self._others(owner) & bit) != 0
+
+    def owners(self, location):
+        bit = location_bit(location)
+        return [owner for owner, mask in self.masks.items() if mask & bit]
+
+    def available(self, locations, owner=None):
+        #the locations not claimed by anyone other than owner, in order.
+        blocked = self._others(owner)
+        if(not blocked):
+            return list(locations)
+        return [loc for loc in locations if not blocked & location_bit(loc)]
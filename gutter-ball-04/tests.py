@@ -0,0 +1,300 @@
+import unittest
+import io
+import json
+import random
+import time
+from unittest import mock
+
+from gamelib import debug_log, GameState
+from gamelib import tests as gamelib_tests
+from attack_evaluator import AttackEvaluator
+from gutter_attack import GutterAttack
+from reservations import TileReservations
+from placement import PlacementOptimizer, SPAWN, UPGRADE
+from maze import MazePlanner, PathEvaluator, TOP_LEFT, TOP_RIGHT
+from economy import SaveSpendPlanner, SAVE
+from algo_strategy import AlgoStrategy
+from board_analysis import BoardAnalysis
+from tools.synthetic import SyntheticMatch, load_config
+
+"""
+Tests for the strategy modules next to algo_strategy.py, on the same turn 0 board as
+gamelib/tests.py. python3 -m unittest discover runs both.
+"""
+
+
+class ScoutRush(object):
+    #just enough of an attack for attack_candidate: a stack of scouts from one tile.
+    def __init__(self, location, num):
+        self.location = location
+        self.num = num
+
+    def attackPossible(self, game_state, context=None):
+        return (True, 0, self.num)
+
+    def spawnAttack(self, game_state):
+        game_state.attempt_spawn("PI", self.location, self.num)
+
+
+def per_tile_attack_possible(attack, gs):
+    #GutterAttack.attackPossible as it was before the masks, one tile lookup at a time.
+    SUPPORT, WALL = "EF", "FF"
+    for loc in attack.path:
+        if(not (gs.contains_stationary_unit(loc) is False)):
+            return (False, 0, 0), []
+    SPcost = 0
+    for loc in GutterAttack.CENTRAL_BUFF_REGION:
+        unit = gs.contains_stationary_unit(loc)
+        if(unit is False):
+            SPcost += gs.type_cost(SUPPORT, False)[0] + gs.type_cost(SUPPORT, True)[0]
+        elif(not unit.upgraded):
+            SPcost += gs.type_cost(SUPPORT, True)[0]
+    for loc in attack.wallpath:
+        if(gs.contains_stationary_unit(loc) is False):
+            SPcost += gs.type_cost(WALL, False)[0]
+    MPcost = 15 if attack.demolishers else 16
+    possible = gs.get_resource(gs.MP) >= MPcost and gs.get_resource(gs.SP) >= SPcost
+    spots = []
+    wall_seg_index = 0
+    while(possible and SPcost > gs.get_resource(gs.SP) - 6 and wall_seg_index < len(attack.wallpath)):
+        site = attack.wallpath[wall_seg_index]
+        if(gs.contains_stationary_unit(site) is False):
+            spots.append(list(site))
+        SPcost += gs.type_cost(SUPPORT, False)[0]
+        wall_seg_index += 1
+    return (possible, SPcost, MPcost), spots
+
+
+class StrategyTests(unittest.TestCase):
+
+    make_turn_0_map = gamelib_tests.BasicTests.make_turn_0_map
+
+    def tearDown(self):
+        # Discard whatever warnings the test left in the debug channel
+        with mock.patch("sys.stderr", new_callable=io.StringIO):
+            debug_log.channel.flush()
+
+    def test_attack_evaluator(self):
+        #the rollouts rebuild the board from the turn string, so the turrets go in there, and with
+        #no SP or MP the enemy's guessed response is empty and the scores do not depend on the seed.
+        base = self.make_turn_0_map()
+        turn = json.loads(base.serialized_string)
+        turn["p2Stats"] = [30.0, 0.0, 0.0, 0]
+        turn["p2Units"][2] = [[13, 16, 75.0, "1"], [14, 16, 75.0, "2"]]
+        game = GameState(base.config, json.dumps(turn))
+        evaluator = AttackEvaluator(game.config, budget=10.0, rollouts=2, workers=1)
+        self.assertIsNone(evaluator.evaluate(game, [ScoutRush([13,0], 1)]), "Nothing can be scored before start()")
+        evaluator.start()
+        self.addCleanup(evaluator.shutdown)
+        self.assertIsNone(evaluator.evaluate(game, []), "No attacks should give no scores")
+        scores = evaluator.evaluate(game, [ScoutRush([13,0], 1), ScoutRush([13,0], 5)])
+        self.assertEqual(2, len(scores), "There should be a score per attack")
+        self.assertGreater(scores[1], scores[0], "More scouts should score better")
+
+        started = time.perf_counter()
+        self.assertIsNone(evaluator.evaluate(game, [ScoutRush([13,0], 5)], budget=0), "No rollout can finish in no time")
+        self.assertLess(time.perf_counter() - started, 0.5, "The budget was not respected")
+        #the rollouts queued past that deadline give up at once, so the worker is free for the next turn.
+        scores = evaluator.evaluate(game, [ScoutRush([13,0], 5)], budget=5.0)
+        self.assertEqual(1, len(scores), "The worker should be free again after a timeout")
+
+    def test_gutter_attack_masks_match_per_tile(self):
+        rng = random.Random(41)
+        attacks = [GutterAttack(self.make_turn_0_map().config, mirror, demo) for mirror in (False, True) for demo in (False, True)]
+        for board in range(60):
+            game = self.make_turn_0_map()
+            density = (0.01, 0.05, 0.2)[board % 3]
+            for x in range(28):
+                for y in range(14):
+                    if(game.game_map.in_arena_bounds([x, y]) and rng.random() < density):
+                        game.game_map.add_unit(rng.choice(["FF", "EF", "DF"]), [x, y], 0)
+                        if(rng.random() < 0.3):
+                            game.game_map[x, y][0].upgrade()
+                            game.game_map.refresh_location([x, y])
+            for attack in attacks:
+                #SP around the build cost, where the bonus supports come in.
+                game._player_resources[0] = {'SP': 1000, 'MP': 30}
+                cost = per_tile_attack_possible(attack, game)[0][1]
+                game._player_resources[0] = {'SP': cost + rng.randint(-2, 8), 'MP': rng.choice([10, 15, 16, 30])}
+                expected, spots = per_tile_attack_possible(attack, game)
+                self.assertEqual(expected, attack.attackPossible(game), "Board {} differs from the per-tile check".format(board))
+                if(expected[0]):
+                    self.assertEqual(spots, [list(spot) for spot in attack.bonus_tower_spots], "Board {} has different bonus supports".format(board))
+
+    def test_tile_reservations(self):
+        reservations = TileReservations()
+        self.assertFalse(reservations.reserved([13,0]), "Nothing is claimed yet")
+        reservations.claim('attack', [[13,0],[14,1]])
+        reservations.claim('defence', ((14,1),(3,12)))
+        self.assertTrue(reservations.reserved([13,0]), "A claimed tile is reserved")
+        self.assertFalse(reservations.reserved([13,0], 'attack'), "An owner is not blocked by its own claims")
+        self.assertTrue(reservations.reserved([13,0], 'defence'), "Another owner's claim should block")
+        self.assertTrue(reservations.reserved([14,1], 'attack'), "A shared tile is still claimed by the other owner")
+        self.assertTrue(reservations.reserved([14,1], 'repair'), "An owner with no claims is blocked by everyone's")
+        self.assertEqual(['attack', 'defence'], sorted(reservations.owners([14,1])), "Both owners claimed the tile")
+        self.assertEqual([], reservations.owners([5,10]), "Nobody claimed the tile")
+        locations = [[3,12],[13,0],[5,10],[14,1]]
+        self.assertEqual([[13,0],[5,10]], reservations.available(locations, 'attack'), "The defence's tiles are not available to the attack")
+        self.assertEqual([[5,10]], reservations.available(locations), "Only unclaimed tiles are available to no one in particular")
+        reservations.release('defence')
+        self.assertEqual(['attack'], reservations.owners([14,1]), "Released claims should be gone")
+        self.assertEqual([[3,12],[13,0],[5,10],[14,1]], reservations.available(locations, 'attack'), "Only the attack's own claims are left")
+        reservations.clear()
+        self.assertEqual(locations, reservations.available(locations, 'defence'), "Everything is available after clear()")
+
+    def test_placement_plan(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13,8], 0)
+        optimizer = PlacementOptimizer(game.config)
+        paths = {(13,27): [[13,y] for y in range(13,2,-1)] + [[x,3] for x in range(12,4,-1)]}
+        reservations = TileReservations()
+        reservations.claim('attack', [[12,7],[14,7],[12,4]])
+        plan = optimizer.plan(game, 20, paths, reservations)
+
+        purchases = optimizer.purchases(game, 20, paths, reservations)
+        self.assertEqual(plan, [step for _, _, actions in purchases for step in actions], "plan() should make the purchases in order")
+        self.assertTrue(all(value > 0 for _, value, _ in purchases), "Only purchases worth something are made")
+        spawn, upgrade = game.type_cost("DF")[0], game.type_cost("DF", True)[0]
+        spent = sum(spawn if action == SPAWN else upgrade for action, _, _ in plan)
+        self.assertLessEqual(spent, 20, "The plan went over budget")
+        self.assertGreater(len(plan), 0, "Turrets on the path should be worth building")
+        self.assertTrue(all(action == UPGRADE for action, _, location in plan if location == (13,8)), "The existing turret can only be upgraded")
+        for i, (action, _, location) in enumerate(plan):
+            self.assertFalse(reservations.reserved(location, 'defence'), "Reserved tile {} was planned".format(location))
+            if(action == SPAWN):
+                self.assertEqual((UPGRADE, "DF", location), plan[i+1], "A new turret must be upgraded at once, or repair removes it")
+
+        #lazy greedy must pick what plain greedy would: the best value per SP left at every step.
+        weights = optimizer.path_weights(paths)
+        damage = optimizer._own_damage(game)
+        candidates = optimizer._candidates(game, ())
+        budget = 20
+        for action, unit_type, location in [step for i, step in enumerate(plan) if i == 0 or plan[i-1][0] != SPAWN]:
+            ratios = [optimizer._value(game, c, weights, damage, reservations)/c[3] for c in candidates if c[3] <= budget]
+            chosen = [c for c in candidates if c[0] == action and c[2] == location][0]
+            self.assertAlmostEqual(max(ratios), optimizer._value(game, chosen, weights, damage, reservations)/chosen[3], 9, "{} was not the best pick".format(location))
+            for tile, extra in optimizer._turret_change(game, location, *chosen[4]):
+                damage[tile] = damage.get(tile, 0.0) + extra
+            candidates.remove(chosen)
+            budget -= chosen[3]
+
+    def reaches_edge(self, game, start):
+        path = game.find_path_to_edge(start)
+        edges = game.game_map.get_edges()
+        return path is not None and list(path[-1]) in edges[game.game_map.TOP_RIGHT if start[0] < 14 else game.game_map.TOP_LEFT]
+
+    def test_maze_keeps_own_spawns(self):
+        game = self.make_turn_0_map()
+        gm = game.game_map
+        #one way in through row 13 and a corridor out through a gap at each end of row 9. The
+        #left gap is the only way out for our spawn at [5,8], and walling it off sends every
+        #unit headed for our left edge the long way round, so it is the wall greedy wants most.
+        board = [[x, 13] for x in range(28) if x != 13] + [[x, 9] for x in range(4, 24) if x not in (5, 22)]
+        board += [[3,10],[2,11],[1,12],[24,10],[25,11],[26,12],[6,8]]
+        for location in board:
+            gm.add_unit("FF", location, 0)
+        starts = gm.get_edge_locations(gm.BOTTOM_LEFT) + gm.get_edge_locations(gm.BOTTOM_RIGHT)
+        reaching = [start for start in starts if self.reaches_edge(game, start)]
+        self.assertIn([5,8], reaching, "The board should leave our spawn at [5,8] a way out")
+        planner = MazePlanner(game.config, max_evaluations=5000, time_limit=10.0)
+        evaluator = PathEvaluator(game, planner._damage(game))
+        enemy_starts = planner._starts(evaluator, (TOP_LEFT, TOP_RIGHT))
+        self.assertGreater(evaluator.score_with(5 + 28*9, enemy_starts, planner.turret_weight),
+                           evaluator.score(enemy_starts, planner.turret_weight), "Walling off [5,9] should lengthen the enemy's paths")
+        walls = planner.plan(game, 30)
+        self.assertNotIn([5,9], walls, "The wall would cut off our spawn")
+        for wall in walls:
+            gm.add_unit("FF", wall, 0)
+        for start in reaching:
+            self.assertTrue(self.reaches_edge(game, start), "The maze cut off our spawn at {}".format(start))
+
+    def test_maze_on_sealed_half(self):
+        game = self.make_turn_0_map()
+        gm = game.game_map
+        #our edges and row 13 sealed but for one gap, and a wall with two gaps further down,
+        #so units come in and head for the deepest tile they can reach instead of our edge.
+        sealed = gm.get_edge_locations(gm.BOTTOM_LEFT) + gm.get_edge_locations(gm.BOTTOM_RIGHT)
+        sealed += [[x, 13] for x in range(1, 27) if x != 13] + [[x, 11] for x in range(3, 25) if x not in (6, 13)]
+        for location in sealed:
+            if(not game.contains_stationary_unit(location)):
+                gm.add_unit("FF", location, 0)
+        start = [13, 27]
+        before = len(game.find_path_to_edge(start))
+        walls = MazePlanner(game.config).plan(game, 4)
+        self.assertGreater(len(walls), 0, "Units stopped short of our edge still have paths to lengthen")
+        for wall in walls:
+            gm.add_unit("FF", wall, 0)
+        self.assertGreater(len(game.find_path_to_edge(start)), before, "The walls should lengthen the engine's path")
+
+    def test_save_spend_plan(self):
+        planner = SaveSpendPlanner(discount=0.9)
+        actions = lambda amount: [('small', 3, 2.0), ('big', 10, 20.0)]
+        value, steps = planner.plan(5, [5], actions)
+        self.assertEqual([(SAVE, 5), ('big', 10)], steps, "With nothing lost to decay, saving up for the big buy must win")
+        self.assertAlmostEqual(18.0, value, 9, "The big buy is worth one turn of discount less")
+        _, steps = planner.plan(5, [5], actions, decay=0.5)
+        self.assertEqual('small', steps[0][0], "Saving cannot reach the big buy once half decays")
+        _, steps = planner.plan(5, [5], actions, cap=8)
+        self.assertEqual('small', steps[0][0], "Saving cannot reach the big buy past the cap")
+        _, steps = planner.plan(5, [5, 5], lambda amount: [])
+        self.assertEqual([(SAVE, 5), (SAVE, 10), (SAVE, 15)], steps, "There is nothing to do but save")
+
+    def test_save_spend_against_the_engine(self):
+        game = self.make_turn_0_map()
+        planner = SaveSpendPlanner()
+        #a wave's worth growing faster than its MP is worth waiting for, one growing in step is not.
+        attack_now, steps = planner.plan_attack(game, lambda held: held**2 if held >= 5 else 0)
+        self.assertFalse(attack_now, "A bigger wave should be worth waiting for")
+        self.assertEqual([game.get_resource(game.MP)] + [round(mp, 1) for _, mp in game.project_resources(2)[0][1:]],
+                         [held for _, held in steps[:3]], "Saving should follow the projected MP")
+        self.assertIn('attack', [name for name, _ in steps], "The saved up wave should go in eventually")
+        self.assertTrue(planner.plan_attack(game, lambda held: held if held >= 5 else 0)[0], "Waiting for a wave worth its MP gains nothing")
+        self.assertFalse(planner.plan_attack(game, lambda held: 0)[0], "There is no attack to make")
+
+        #with 5 SP spare, a wall now would leave too little for the upgrade next turn.
+        items = [('wall', 4, 1.0), ('upgrade', 8, 10.0)]
+        spend, steps = planner.plan_structures(game, items, reserve=20)
+        self.assertEqual((0, SAVE), (spend, steps[0][0]), "Saving for the upgrade must win")
+        self.assertEqual('upgrade', steps[1][0], "The upgrade should be bought as soon as it is affordable")
+        spend, steps = planner.plan_structures(game, items)
+        self.assertIn('upgrade', steps[0][0].split('+'), "With the reserve free the upgrade is affordable now")
+        self.assertEqual(sum(cost for name, cost, _ in items if name in steps[0][0].split('+')), spend, "spend should be the cost of this turn's buys")
+
+    def make_strategy(self):
+        #an algo set up for the real config, without the rollout workers.
+        config = load_config()
+        strategy = AlgoStrategy()
+        with mock.patch.object(AttackEvaluator, "start"):
+            strategy.on_game_start(config)
+        game = GameState(config, SyntheticMatch(config).message())
+        game.suppress_warnings(True)
+        return strategy, game
+
+    def test_surplus_follows_the_economy_plan(self):
+        strategy, game = self.make_strategy()
+        game._player_resources[0] = {'SP': strategy.SP_reserve + 5, 'MP': 5}
+        turret = [(SPAWN, "DF", (13,5)), (UPGRADE, "DF", (13,5))]
+        #one buy we cannot afford yet: the planner saves for it, so nothing is built, even though
+        #the budget would cover something cheaper.
+        with mock.patch.object(strategy.placement, "purchases", return_value=[(10, 5.0, turret)]):
+            with mock.patch.object(strategy.placement, "plan", return_value=[(SPAWN, "FF", (13,5))]) as plan:
+                self.assertEqual(0, strategy.spend_surplus(game), "Saving should build nothing this turn")
+                plan.assert_not_called()
+        self.assertEqual([], game._build_stack, "Saving should build nothing this turn")
+        #one buy we can afford: nothing is worth waiting for, so the whole budget is spent.
+        with mock.patch.object(strategy.placement, "purchases", return_value=[(4, 5.0, turret)]):
+            with mock.patch.object(strategy.placement, "plan", return_value=[]) as plan:
+                strategy.spend_surplus(game)
+                self.assertEqual(5, plan.call_args[0][1], "The whole budget should go to the optimizer")
+
+    def test_surplus_keeps_off_attack_paths(self):
+        strategy, game = self.make_strategy()
+        #plenty of SP to spend and no MP, so no attack claims its tiles this turn.
+        game._player_resources[0] = {'SP': 400, 'MP': 0}
+        reserved = set(tuple(loc) for attack in strategy.attackSuite for loc in attack.reservedSquares())
+        with mock.patch.object(strategy.placement, "apply", wraps=strategy.placement.apply) as apply:
+            strategy.starter_strategy(game, {'analysis': BoardAnalysis(game)})
+        plan = apply.call_args[0][1]
+        self.assertGreater(len(plan), 0, "The surplus should buy something")
+        for _, _, location in plan:
+            self.assertNotIn(tuple(location), reserved, "A surplus structure at {} blocks an attack".format(location))
@@ -0,0 +1,214 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gamelib
+from algo_strategy import AlgoStrategy
+import boardgen
+from synthetic import load_config, WALL, TURRET, SCOUT, INTERCEPTOR
+from timing import latency_summary
+
+"""
+Times gamelib's hot paths and the strategy on early, mid and dense late game boards, and on
+the adversarial maze, pocket and swarm boards from boardgen.py.
+Results are written as JSON so runs before and after a change can be compared:
+
+    python tools/benchmarks.py --json before.json
+    python tools/benchmarks.py --only find_path_to_edge --repeat 50
+
+Every benchmark times a whole batch, e.g. a path from every free edge tile, and reports
+latency percentiles of that batch over the repeats.
+"""
+
+# Turrets the strategy always rebuilds, see AlgoStrategy.on_game_start
+CORE_TURRETS = [[3, 12], [24, 12], [11, 8], [16, 8]]
+
+BOARDS = {
+    # board name: (turn number, structure density, mobile units)
+    "early": (2, 0.03, 0),
+    "mid": (12, 0.15, 0),
+    "late": (40, 0.4, 0),
+    "maze": (40, None, 0),
+    "pocket": (40, None, 0),
+    "swarm": (40, 0.2, 2000),
+}
+
+
+def make_board(config, name, seed=0):
+    """
+    A serialized state for one of BOARDS, an action frame if it has mobile units. Both players
+    get plenty of SP and MP, so spending benchmarks are not cut short.
+    """
+    turn, density, mobile = BOARDS[name]
+    rng = random.Random("{}-{}".format(name, seed))
+    if(density is None):
+        board = boardgen.generate(config, name, rng)
+    else:
+        board = boardgen.empty_board()
+        for x, y in CORE_TURRETS:
+            boardgen.add_structure(config, board, 0, TURRET, x, y, upgraded=turn > 2)
+        board = boardgen.mirrored(board)
+        for player, index, x, y, upgraded, health in boardgen.random_board(config, rng, density)["structures"]:
+            boardgen.add_structure(config, board, player, index, x, y, upgraded, health)
+    boardgen.add_mobile(config, rng, board, mobile)
+    return boardgen.to_message(config, board, turn=turn, resources=[[200, 60], [200, 60]])
+
+
+def bench(function, setup=None, repeat=20):
+    """
+    Times function(setup()) repeat times, setup is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return latency_summary(times)
+
+
+def _free_edges(game_state):
+    gm = game_state.game_map
+    edges = gm.get_edge_locations(gm.BOTTOM_LEFT) + gm.get_edge_locations(gm.BOTTOM_RIGHT)
+    return [loc for loc in edges if not game_state.contains_stationary_unit(loc)]
+
+
+def _half_board(game_state):
+    return [[x, y] for x in range(28) for y in range(14) if game_state.game_map.in_arena_bounds([x, y])]
+
+
+def _with_mobile_units(game_state):
+    units = []
+    for loc in _free_edges(game_state):
+        game_state.game_map.add_unit(game_state.config["unitInformation"][SCOUT]["shorthand"], loc, 0)
+        units.append(game_state.game_map[loc][-1])
+    for x in range(4, 24, 2):
+        if(not game_state.contains_stationary_unit([x, 14])):
+            game_state.game_map.add_unit(game_state.config["unitInformation"][INTERCEPTOR]["shorthand"], [x, 14], 1)
+            units.append(game_state.game_map[x, 14][-1])
+    return game_state, units
+
+
+class Suite(object):
+    """
+    The benchmarks, each a method taking a board message and returning a latency summary.
+    """
+    NAMES = ["parse", "find_path_to_edge", "get_attackers", "get_target", "attempt_spawn", "attack_possible", "on_turn"]
+
+    def __init__(self, config, repeat=20, turn_repeat=3):
+        self.config = config
+        self.repeat = repeat
+        self.turn_repeat = turn_repeat
+        self._algo = None
+
+    def _state(self, board):
+        game_state = gamelib.GameState(self.config, board)
+        game_state.suppress_warnings(True)
+        return game_state
+
+    def parse(self, board):
+        return bench(lambda _: gamelib.GameState(self.config, board), repeat=self.repeat)
+
+    def find_path_to_edge(self, board):
+        def paths(game_state):
+            for loc in _free_edges(game_state):
+                game_state.find_path_to_edge(loc)
+        return bench(paths, lambda: self._state(board), self.repeat)
+
+    def get_attackers(self, board):
+        def attackers(game_state):
+            for loc in _half_board(game_state):
+                game_state.get_attackers(loc, 0)
+        return bench(attackers, lambda: self._state(board), self.repeat)
+
+    def get_target(self, board):
+        def targets(prepared):
+            game_state, units = prepared
+            for unit in units:
+                game_state.get_target(unit)
+        return bench(targets, lambda: _with_mobile_units(self._state(board)), self.repeat)
+
+    def attempt_spawn(self, board):
+        shorthand = [unit["shorthand"] for unit in self.config["unitInformation"]]
+        def spawn(game_state):
+            game_state.attempt_spawn(shorthand[WALL], _half_board(game_state))
+            for loc in _free_edges(game_state):
+                game_state.attempt_spawn(shorthand[SCOUT], loc, 2)
+        return bench(spawn, lambda: self._state(board), self.repeat)
+
+    def _strategy(self):
+        if(self._algo is None):
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                self._algo = AlgoStrategy()
+                self._algo.handle_message(json.dumps(self.config))
+        return self._algo
+
+    def attack_possible(self, board):
+        attacks = self._strategy().attackSuite
+        def possible(game_state):
+            for attack in attacks:
+                attack.attackPossible(game_state)
+        return bench(possible, lambda: self._state(board), self.repeat)
+
+    def on_turn(self, board):
+        algo = self._strategy()
+        def turn(_):
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                algo.turn_start_time = time.perf_counter()
+                algo.on_turn(board)
+                gamelib.debug_log.channel.flush()
+        return bench(turn, repeat=self.turn_repeat)
+
+    def close(self):
+        if(self._algo is not None):
+            self._algo.on_game_end()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gamelib and the strategy on generated boards")
+    parser.add_argument("--config", default=None, help="Game config, tools/game_config.json by default")
+    parser.add_argument("--repeat", type=int, default=20, help="Repeats of each gamelib benchmark")
+    parser.add_argument("--turn-repeat", type=int, default=3, help="Repeats of the full on_turn benchmark")
+    parser.add_argument("--boards", nargs="+", default=list(BOARDS), choices=list(BOARDS))
+    parser.add_argument("--only", nargs="+", default=Suite.NAMES, choices=Suite.NAMES)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random parts of the boards")
+    parser.add_argument("--json", help="Write the results to this file as well as printing them")
+    args = parser.parse_args()
+
+    config = load_config(args.config) if args.config else load_config()
+    suite = Suite(config, args.repeat, args.turn_repeat)
+    results = {}
+    try:
+        for board_name in args.boards:
+            board = make_board(config, board_name, args.seed)
+            results[board_name] = {}
+            for name in args.only:
+                summary = getattr(suite, name)(board)
+                results[board_name][name] = summary
+                print("{:<6} {:<18} p50 {:>9.2f} ms  p90 {:>9.2f} ms  max {:>9.2f} ms".format(
+                    board_name, name, 1000*summary["p50"], 1000*summary["p90"], 1000*summary["max"]))
+    finally:
+        suite.close()
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if(args.json):
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gamelib
+from synthetic import SyntheticMatch, load_config, WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR
+
+"""
+Generates legal boards for stress tests and benchmarks, as specs that can be changed and
+shrunk and as the serialized states GameState reads.
+
+A board spec is a dict of
+    structures: [player, unit index, x, y, upgraded, health] lists, at most one per tile,
+                always on the owner's half
+    mobile:     [player, unit index, x, y] lists, any number per tile
+
+Kinds of board:
+    random  structures scattered at a given density
+    maze    serpentine wall rows that make enemy paths as long as possible
+    pocket  sealed halves full of walled pockets, so every path is a self destruct search
+            over the whole reachable area
+Any of them can be covered in thousands of mobile units for action frame tests.
+
+    python tools/boardgen.py --kind maze --mobile 2000 --seed 3 > board.json
+"""
+
+KINDS = ["random", "maze", "pocket"]
+
+_game_map = None
+
+
+def _in_bounds(config, location):
+    global _game_map
+    if(_game_map is None):
+        _game_map = gamelib.GameMap(config)
+    return _game_map.in_arena_bounds(location)
+
+
+def half_tiles(config, player):
+    rows = range(14) if player == 0 else range(14, 28)
+    return [[x, y] for y in rows for x in range(28) if _in_bounds(config, [x, y])]
+
+
+def empty_board():
+    return {"structures": [], "mobile": []}
+
+
+def add_structure(config, board, player, index, x, y, upgraded=False, health=None):
+    """
+    Adds a structure unless the tile is off the player's half or already built on.
+    Returns whether it was added.
+    """
+    if(not _in_bounds(config, [x, y]) or (y < 14) != (player == 0)):
+        return False
+    if(any(s[2] == x and s[3] == y for s in board["structures"])):
+        return False
+    if(health is None):
+        unit = config["unitInformation"][index]
+        health = unit.get("upgrade", {}).get("startHealth", unit["startHealth"]) if upgraded else unit["startHealth"]
+    board["structures"].append([player, index, x, y, upgraded, health])
+    return True
+
+
+def mirrored(board):
+    """
+    The board with player 0's structures copied onto player 1's half, flipped top to bottom.
+    """
+    mirror = {"structures": [s for s in board["structures"] if s[0] == 0], "mobile": list(board["mobile"])}
+    mirror["structures"] += [[1, index, x, 27 - y, upgraded, health] for _, index, x, y, upgraded, health in mirror["structures"]]
+    return mirror
+
+
+def random_board(config, rng, density=0.3, weights=None, upgraded=0.3, damaged=0.25):
+    """
+    Structures on a random share of each half's tiles.
+
+    Args:
+        density: The chance of each tile having a structure
+        weights: Relative frequency of WALL, SUPPORT and TURRET, walls and turrets twice as
+            common as supports by default
+        upgraded: The chance of each structure being upgraded
+        damaged: The chance of each structure having lost some health
+
+    """
+    weights = weights or [2, 1, 2]
+    board = empty_board()
+    for player in (0, 1):
+        for x, y in half_tiles(config, player):
+            if(rng.random() < density):
+                index = rng.choices([WALL, SUPPORT, TURRET], weights)[0]
+                is_upgraded = rng.random() < upgraded
+                add_structure(config, board, player, index, x, y, is_upgraded)
+                if(rng.random() < damaged):
+                    board["structures"][-1][5] *= rng.choice([0.75, 0.5, 0.25])
+    return board
+
+
+def maze_board(config, rng, spacing=2, turrets=0.1):
+    """
+    Serpentine wall rows on both halves, spacing rows apart, each open at one end only and
+    the open end alternating. The edge tiles between the rows are walled too, so the only
+    way in or out is at the top and bottom corners and units zig-zag across both halves.
+    A few of the wall tiles are turrets instead.
+    """
+    board = empty_board()
+    open_left = rng.random() < 0.5
+    for y in range(13, 1, -spacing):
+        row = [x for x in range(28) if _in_bounds(config, [x, y])]
+        # Two in from the end, so the gap opens onto the inside of the rows either side
+        gap = row[2] if open_left else row[-3]
+        for x in row:
+            if(x != gap):
+                add_structure(config, board, 0, TURRET if rng.random() < turrets else WALL, x, y)
+        open_left = not open_left
+    for y in range(2, 14):
+        for x in (13 - y, 14 + y):
+            add_structure(config, board, 0, WALL, x, y)
+    return mirrored(board)
+
+
+def pocket_board(config, rng, pockets=12, sealed=True):
+    """
+    Rings of walls around empty tiles scattered over both halves. With sealed the front row
+    of each half is walled off completely, so no unit can reach an edge and every path
+    ends in the pathfinder's self destruct search.
+    """
+    board = empty_board()
+    if(sealed):
+        for x in range(28):
+            add_structure(config, board, 0, WALL, x, 13)
+    for _ in range(pockets):
+        cx, cy = rng.randrange(1, 27), rng.randrange(1, 12)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if(dx != 0 or dy != 0):
+                    add_structure(config, board, 0, rng.choice([WALL, WALL, WALL, TURRET]), cx + dx, cy + dy)
+    return mirrored(board)
+
+
+def add_mobile(config, rng, board, count, players=(0, 1), types=None):
+    """
+    Adds count mobile units on random free tiles anywhere on the board, stacking freely.
+    """
+    types = types or [SCOUT, DEMOLISHER, INTERCEPTOR]
+    built = set((s[2], s[3]) for s in board["structures"])
+    free = [loc for player in (0, 1) for loc in half_tiles(config, player) if tuple(loc) not in built]
+    for _ in range(count):
+        x, y = rng.choice(free)
+        board["mobile"].append([rng.choice(players), rng.choice(types), x, y])
+    return board
+
+
+def generate(config, kind, rng, density=0.3, mobile=0):
+    if(kind == "maze"):
+        board = maze_board(config, rng)
+    elif(kind == "pocket"):
+        board = pocket_board(config, rng)
+    else:
+        board = random_board(config, rng, density)
+    return add_mobile(config, rng, board, mobile)
+
+
+def to_message(config, board, turn_type=None, turn=0, resources=None):
+    """
+    The serialized state for a board spec. Mobile units only appear in action frames, so
+    by default it is an action frame if the board has any and a turn start otherwise.
+
+    Args:
+        turn_type: 0 for a turn start, 1 for an action frame
+        turn: The turn number
+        resources: [[SP, MP], [SP, MP]] for the two players, the starting resources if None
+
+    """
+    match = SyntheticMatch(config)
+    match.turn = turn
+    if(resources is not None):
+        match.resources = [list(r) for r in resources]
+    for player, index, x, y, upgraded, health in board["structures"]:
+        match.structures[player][(x, y)] = [index, health, upgraded, match._unit_id()]
+    for player, index, x, y in board["mobile"]:
+        match.mobile[player].append([index, x, y, match._unit_id()])
+    if(turn_type is None):
+        turn_type = 1 if board["mobile"] else 0
+    return match.message(turn_type, 0 if turn_type == 1 else -1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print generated boards as engine messages, one per line")
+    parser.add_argument("--kind", default="random", choices=KINDS)
+    parser.add_argument("--density", type=float, default=0.3, help="Structure density of random boards")
+    parser.add_argument("--mobile", type=int, default=0, help="Mobile units to scatter over the board")
+    parser.add_argument("--count", type=int, default=1, help="How many boards to print")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spec", action="store_true", help="Print board specs instead of engine messages")
+    parser.add_argument("--config", default=None, help="Game config, tools/game_config.json by default")
+    args = parser.parse_args()
+
+    config = load_config(args.config) if args.config else load_config()
+    rng = random.Random(args.seed)
+    for _ in range(args.count):
+        board = generate(config, args.kind, rng, args.density, args.mobile)
+        print(json.dumps(board) if args.spec else to_message(config, board))
+
+
+if __name__ == "__main__":
+    main()
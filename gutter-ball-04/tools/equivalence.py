@@ -0,0 +1,222 @@
+import argparse
+import atexit
+import importlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS))
+
+import gamelib
+import boardgen
+from synthetic import load_config
+
+"""
+Differential testing of pathing, targeting and attacker queries.
+
+The reference is gamelib as committed at a git revision (HEAD by default), loaded as a
+separate package, so rewrites in the working tree are checked against the code they
+replace. Both are asked the same questions on thousands of random legal boards from boardgen.py, and every
+disagreement is shrunk to a minimal board, removing structures and units one at a time
+while the disagreement persists, and written out as JSON:
+
+    python tools/equivalence.py --boards 2000
+    python tools/equivalence.py --reference origin/main --only find_path_to_edge
+
+Other implementations can be checked in-process with compare(), which takes candidate
+functions with the same signature as the GameState methods they stand in for.
+"""
+
+CHECKS = ["find_path_to_edge", "get_target", "get_attackers"]
+
+
+def load_reference(revision="HEAD"):
+    """
+    gamelib as of revision, imported as the reference_gamelib package.
+    """
+    if("reference_gamelib" in sys.modules):
+        return sys.modules["reference_gamelib"]
+    root = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], cwd=TOOLS, universal_newlines=True).strip()
+    prefix = os.path.relpath(os.path.join(os.path.dirname(TOOLS), "gamelib"), root).replace(os.sep, "/")
+    files = subprocess.check_output(["git", "ls-tree", "--name-only", revision, prefix + "/"], cwd=root, universal_newlines=True).split()
+    checkout = tempfile.mkdtemp(prefix="reference-")
+    atexit.register(shutil.rmtree, checkout, True)
+    directory = os.path.join(checkout, "reference_gamelib")
+    os.makedirs(directory)
+    for path in files:
+        if(path.endswith(".py")):
+            source = subprocess.check_output(["git", "show", "{}:{}".format(revision, path)], cwd=root)
+            with open(os.path.join(directory, os.path.basename(path)), "wb") as out:
+                out.write(source)
+    sys.path.insert(0, checkout)
+    return importlib.import_module("reference_gamelib")
+
+
+def random_board(config, rng):
+    """
+    A random board from boardgen: mostly scattered structures at a random density, some mazes
+    and pocketed boards, with a scattering of mobile units for get_target to choose between.
+    """
+    kind = rng.choices(boardgen.KINDS, [6, 1, 1])[0]
+    return boardgen.generate(config, kind, rng, density=rng.uniform(0.0, 0.5), mobile=rng.randrange(0, 60))
+
+
+def board_message(config, board):
+    """
+    The action frame message for a board spec, so mobile units are included.
+    """
+    return boardgen.to_message(config, board, 1)
+
+
+def _describe(unit):
+    if(unit is None):
+        return None
+    return [unit.unit_type, unit.player_index, unit.x, unit.y]
+
+
+def queries(game_state, rng, count):
+    """
+    The questions to ask about a board: (check, arguments) pairs for up to count random
+    start tiles, locations and attacking units.
+    """
+    gm = game_state.game_map
+    edges = [edge for quadrant in (gm.TOP_LEFT, gm.TOP_RIGHT, gm.BOTTOM_LEFT, gm.BOTTOM_RIGHT) for edge in gm.get_edge_locations(quadrant)]
+    tiles = [[x, y] for x in range(28) for y in range(28) if gm.in_arena_bounds([x, y])]
+    starts = [loc for loc in edges + rng.sample(tiles, 20) if not game_state.contains_stationary_unit(loc)]
+    units = [(x, y, i) for x, y in tiles for i in range(len(gm[x, y])) if gm[x, y][i].damage_i + gm[x, y][i].damage_f > 0]
+    asked = []
+    for loc in rng.sample(starts, min(count, len(starts))):
+        asked.append(("find_path_to_edge", (loc[0], loc[1])))
+    for x, y, i in rng.sample(units, min(count, len(units))):
+        asked.append(("get_target", (x, y, i)))
+    for loc in rng.sample(tiles, min(count, len(tiles))):
+        asked.append(("get_attackers", (loc[0], loc[1], rng.choice([0, 1]))))
+    return asked
+
+
+def answer(game_state, check, arguments, function=None):
+    """
+    Asks one question, using function(game_state, ...) instead of the GameState method if given,
+    and returns the answer in a form that compares equal across implementations.
+    """
+    function = function or getattr(type(game_state), check)
+    if(check == "find_path_to_edge"):
+        path = function(game_state, list(arguments))
+        return None if path is None else [list(loc) for loc in path]
+    if(check == "get_target"):
+        x, y, i = arguments
+        return _describe(function(game_state, game_state.game_map[x, y][i]))
+    x, y, player = arguments
+    return sorted(_describe(unit) for unit in function(game_state, [x, y], player))
+
+
+def _state(module, config, message):
+    game_state = module.GameState(config, message)
+    game_state.suppress_warnings(True)
+    return game_state
+
+
+def compare(config, board, asked, reference, candidates=None):
+    """
+    Asks every question of the reference and the candidate and returns the disagreements as
+    (check, arguments, reference answer, candidate answer) tuples.
+
+    Args:
+        reference: The gamelib package holding the reference implementation
+        candidates: Dict of check name to a function standing in for that GameState method,
+            the working tree's gamelib is used for any check without one
+
+    """
+    candidates = candidates or {}
+    message = board_message(config, board)
+    mismatches = []
+    for check, arguments in asked:
+        # Fresh states for every question, so nothing one answer caches or changes leaks into the next
+        expected = answer(_state(reference, config, message), check, arguments)
+        actual = answer(_state(gamelib, config, message), check, arguments, candidates.get(check))
+        if(expected != actual):
+            mismatches.append((check, arguments, expected, actual))
+    return mismatches
+
+
+def _without(board, key, index):
+    shrunk = dict(board)
+    shrunk[key] = board[key][:index] + board[key][index + 1:]
+    return shrunk
+
+
+def _still_fails(config, board, check, arguments, reference, candidates):
+    try:
+        return len(compare(config, board, [(check, arguments)], reference, candidates)) > 0
+    except Exception:
+        # The question no longer makes sense, e.g. the attacking unit was removed
+        return False
+
+
+def minimize(config, board, check, arguments, reference, candidates=None):
+    """
+    Removes structures and mobile units one at a time for as long as the same question still
+    gets different answers, and returns the smallest board found.
+    """
+    shrinking = True
+    while shrinking:
+        shrinking = False
+        for key in ("structures", "mobile"):
+            index = len(board[key]) - 1
+            while index >= 0:
+                smaller = _without(board, key, index)
+                if(_still_fails(config, smaller, check, arguments, reference, candidates)):
+                    board = smaller
+                    shrinking = True
+                index -= 1
+    return board
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check gamelib's pathing and targeting against a reference revision on random boards")
+    parser.add_argument("--reference", default="HEAD", help="Git revision holding the reference gamelib")
+    parser.add_argument("--boards", type=int, default=1000, help="Random boards to check")
+    parser.add_argument("--queries", type=int, default=10, help="Questions of each kind per board")
+    parser.add_argument("--only", nargs="+", default=CHECKS, choices=CHECKS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", default=None, help="Game config, tools/game_config.json by default")
+    parser.add_argument("--out", default="equivalence_failures.json", help="Where to write minimized failing boards")
+    parser.add_argument("--max-failures", type=int, default=5, help="Stop after this many minimized failures")
+    args = parser.parse_args()
+
+    config = load_config(args.config) if args.config else load_config()
+    reference = load_reference(args.reference)
+    rng = random.Random(args.seed)
+    failures = []
+    for number in range(args.boards):
+        board = random_board(config, rng)
+        asked = [query for query in queries(_state(gamelib, config, board_message(config, board)), rng, args.queries) if query[0] in args.only]
+        for check, arguments, expected, actual in compare(config, board, asked, reference):
+            small = minimize(config, board, check, arguments, reference)
+            failures.append({"board": number, "check": check, "arguments": list(arguments),
+                             "reference": expected, "candidate": actual, "minimized": small,
+                             "message": board_message(config, small)})
+            print("board {}: {}{} differs, minimized to {} structures and {} mobile units".format(
+                number, check, tuple(arguments), len(small["structures"]), len(small["mobile"])))
+            break
+        if(len(failures) >= args.max_failures):
+            break
+        if((number + 1) % 100 == 0):
+            print("{} boards checked".format(number + 1))
+
+    if(failures):
+        with open(args.out, "w") as out:
+            json.dump(failures, out, indent=2)
+        print("{} failures written to {}".format(len(failures), args.out))
+        return 1
+    print("No differences on {} boards".format(args.boards))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from synthetic import SyntheticMatch, load_config
+from timing import latency_summary
+
+"""
+Plays the engine's side of the stdin/stdout protocol against one or more algo processes,
+so the whole AlgoCore.start() loop can be load tested without the real engine or a network.
+
+Each game sends the config line, then for every turn a turnInfo type 0 state, waits for the
+two command lines, applies them to a SyntheticMatch (the second player mirrors the first)
+and streams action frames (type 1) at the requested frame rate. A type 2 state ends the game.
+
+    python tools/mock_engine.py --games 4 --turns 30 --fps 60
+"""
+
+RUN_SH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run.sh")
+
+
+class AlgoProcess(object):
+    """
+    One algo subprocess. Lines it prints are timestamped on a reader thread as they arrive,
+    so latency is measured from when the engine would have seen them.
+    """
+    def __init__(self, command, stderr=None):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=stderr if stderr is not None else subprocess.DEVNULL,
+                                        universal_newlines=True, bufsize=1)
+        self.lines = queue.Queue()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.put((time.perf_counter(), line.strip()))
+        self.lines.put((time.perf_counter(), None))
+
+    def send(self, message):
+        self.process.stdin.write(message + "\n")
+        self.process.stdin.flush()
+
+    def receive(self, timeout):
+        """
+        The next (arrival time, line) the algo printed, line is None if it exited and
+        (None, None) if nothing arrived within timeout.
+        """
+        try:
+            return self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+
+    def close(self, timeout=5.0):
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            return self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            return self.process.wait()
+
+
+class MockGame(object):
+    """
+    Plays one synthetic game against one algo process and records what happened.
+    """
+    def __init__(self, command, config, turns=20, fps=30.0, frames=20, timeout=None, stderr=None):
+        self.command = command
+        self.config = config
+        self.turns = turns
+        self.fps = fps
+        self.frames = frames
+        # The engine waits at most waitTimeBotMax before it gives up on an algo
+        self.timeout = timeout if timeout is not None else config.get("timingAndReplay", {}).get("waitTimeBotMax", 35000) / 1000
+        self.stderr = stderr
+        self.latencies = []
+        self.timeouts = 0
+        self.frames_sent = 0
+        self.messages_sent = 0
+        self.exit_code = None
+        self.error = None
+        # Command lines a timed out turn still owes, they arrive before the next turn's
+        self.late = 0
+
+    def _send(self, algo, message):
+        algo.send(message)
+        self.messages_sent += 1
+
+    def _commands(self, algo, sent):
+        """
+        Reads back one turn's two command lines, returns them and whether they were all there.
+        The lines a timed out turn sends late are dropped, so they are never taken for this turn's.
+        """
+        commands = []
+        deadline = sent + self.timeout
+        while len(commands) < 2:
+            arrived, line = algo.receive(max(0.0, deadline - time.perf_counter()))
+            if(line is None):
+                if(arrived is not None):
+                    raise RuntimeError("algo exited during turn {}".format(len(self.latencies) + self.timeouts))
+                self.late += 2 - len(commands)
+                return commands, False
+            if(self.late > 0):
+                self.late -= 1
+                continue
+            commands.append(line)
+        self.latencies.append(arrived - sent)
+        return commands, True
+
+    def play(self):
+        match = SyntheticMatch(self.config)
+        algo = AlgoProcess(self.command, self.stderr)
+        try:
+            self._send(algo, json.dumps(self.config))
+            for _ in range(self.turns):
+                sent = time.perf_counter()
+                self._send(algo, match.message(0))
+                commands, complete = self._commands(algo, sent)
+                if(not complete):
+                    self.timeouts += 1
+                build, deploy = (commands + ["[]", "[]"])[:2]
+                match.apply(0, build, deploy)
+                match.apply(1, *match.mirror(build, deploy))
+                for frame in range(self.frames):
+                    if(self.fps > 0):
+                        time.sleep(1.0 / self.fps)
+                    self._send(algo, match.message(1, frame))
+                    self.frames_sent += 1
+                match.end_turn()
+            self._send(algo, match.message(2))
+        except (BrokenPipeError, RuntimeError) as error:
+            self.error = str(error)
+        finally:
+            self.exit_code = algo.close()
+        return self
+
+
+def run_games(command, config, games=1, turns=20, fps=30.0, frames=20, timeout=None, stderr=None):
+    """
+    Plays games concurrent games, one algo process each, and returns the finished MockGames
+    with the wall clock time they took.
+    """
+    mocks = [MockGame(command, config, turns, fps, frames, timeout, stderr) for _ in range(games)]
+    threads = [threading.Thread(target=mock.play) for mock in mocks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return mocks, time.perf_counter() - start
+
+
+def report(mocks, elapsed):
+    latencies = [latency for mock in mocks for latency in mock.latencies]
+    summary = latency_summary(latencies)
+    summary.update({
+        "games": len(mocks),
+        "elapsed": elapsed,
+        "turns_per_second": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "messages_per_second": sum(mock.messages_sent for mock in mocks) / elapsed if elapsed > 0 else 0.0,
+        "frames_sent": sum(mock.frames_sent for mock in mocks),
+        "timeouts": sum(mock.timeouts for mock in mocks),
+        "errors": [mock.error for mock in mocks if mock.error],
+        "exit_codes": [mock.exit_code for mock in mocks],
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the game engine's role against local algo processes")
+    parser.add_argument("--command", default="bash " + RUN_SH, help="How to start an algo, run.sh by default")
+    parser.add_argument("--config", default=None, help="Game config to send, tools/game_config.json by default")
+    parser.add_argument("--games", type=int, default=1, help="Algo processes to drive at once")
+    parser.add_argument("--turns", type=int, default=20, help="Turns per game")
+    parser.add_argument("--frames", type=int, default=20, help="Action frames per turn")
+    parser.add_argument("--fps", type=float, default=30.0, help="Action frames per second, 0 to send them as fast as possible")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds to wait for a turn's commands, the config's waitTimeBotMax by default")
+    parser.add_argument("--algo-stderr", default=None, help="Append the algos' debug output to this file instead of discarding it")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    config = load_config(args.config) if args.config else load_config()
+    stderr = open(args.algo_stderr, "a") if args.algo_stderr else None
+    try:
+        mocks, elapsed = run_games(args.command.split(), config, args.games, args.turns, args.fps, args.frames, args.timeout, stderr)
+    finally:
+        if stderr:
+            stderr.close()
+
+    summary = report(mocks, elapsed)
+    print("{} games, {} turns in {:.1f}s: {:.2f} turns/s, {:.1f} messages/s, {} timeouts".format(
+        summary["games"], summary["count"], elapsed, summary["turns_per_second"], summary["messages_per_second"], summary["timeouts"]))
+    print("turn latency ms: p50 {:.1f}  p90 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+        1000*summary["p50"], 1000*summary["p90"], 1000*summary["p99"], 1000*summary["max"]))
+    for error in summary["errors"]:
+        print("error: {}".format(error))
+    if(args.json):
+        with open(args.json, "w") as out:
+            json.dump(summary, out, indent=2)
+    return 1 if summary["errors"] or summary["timeouts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
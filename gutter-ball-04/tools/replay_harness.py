@@ -0,0 +1,170 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stderr, redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gamelib
+from gamelib import reader
+from gamelib.replay import INBOUND, read_replay
+from gamelib.util import add_command_listener, remove_command_listener
+from algo_strategy import AlgoStrategy
+from synthetic import SyntheticMatch, load_config
+from timing import latency_summary, percentile
+
+"""
+Drives AlgoStrategy in-process, without the game engine, and reports how long it takes.
+
+Messages come either from a log recorded with ALGO_REPLAY_LOG, or from a synthetic mirror
+match played against the algo's own commands. Every message goes through
+AlgoCore.handle_message() exactly as start() would send it, but stdin is never read and
+whatever submit_turn() sends to the engine is captured instead of printed.
+
+    python tools/replay_harness.py --turns 30
+    python tools/replay_harness.py --replay game.c1rp --allocations --json timings.json
+"""
+
+
+def summarise(samples):
+    summary = latency_summary([sample["seconds"] for sample in samples])
+    summary["blocks"] = percentile([sample["blocks"] for sample in samples], 0.5)
+    if(len(samples) > 0 and "peak" in samples[0]):
+        summary["peak"] = max(sample["peak"] for sample in samples)
+    return summary
+
+
+class Harness(object):
+    """
+    Feeds messages to an algo and keeps a timing sample for each one it handles.
+    samples[kind] is a list of {"seconds", "blocks"(, "peak")} dicts, commands is everything
+    the algo sent, in order.
+    """
+    def __init__(self, algo, allocations=False, verbose=False):
+        self.algo = algo
+        self.allocations = allocations
+        self.verbose = verbose
+        self.samples = {reader.CONFIG: [], reader.TURN: [], reader.ACTION_FRAME: [], reader.END: []}
+        self.commands = []
+        self.algo.threaded_input = False
+        self.algo.watchdog.activate()
+
+    def send(self, message):
+        """
+        Hands one message to the algo and returns the commands it sent in response.
+        """
+        kind = reader.classify(message)
+        sent = []
+        add_command_listener(sent.append)
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output), (redirect_stderr(output) if not self.verbose else _nothing()):
+                if(self.allocations):
+                    tracemalloc.reset_peak()
+                    base = tracemalloc.get_traced_memory()[0]
+                blocks = sys.getallocatedblocks()
+                start = time.perf_counter()
+                self.algo.handle_message(message, kind)
+                seconds = time.perf_counter() - start
+                blocks = sys.getallocatedblocks() - blocks
+                if(self.allocations):
+                    peak = tracemalloc.get_traced_memory()[1] - base
+                gamelib.debug_log.channel.flush()
+        finally:
+            remove_command_listener(sent.append)
+        sample = {"seconds": seconds, "blocks": blocks}
+        if(self.allocations):
+            sample["peak"] = peak
+        if(kind in self.samples):
+            self.samples[kind].append(sample)
+        self.commands.extend(sent)
+        return sent
+
+    def run(self, messages):
+        if(self.allocations):
+            tracemalloc.start()
+        try:
+            for message in messages:
+                self.send(message)
+        finally:
+            if(self.allocations):
+                tracemalloc.stop()
+
+    def report(self):
+        return {kind: summarise(samples) for kind, samples in self.samples.items() if len(samples) > 0}
+
+
+class _nothing(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def replayed_messages(path):
+    for direction, _, message in read_replay(path):
+        if(direction == INBOUND):
+            yield message
+
+
+def synthetic_messages(harness, config, turns, frames):
+    """
+    Plays a mirror match: the algo's own commands are applied for both players between turns.
+    """
+    match = SyntheticMatch(config)
+    yield json.dumps(config)
+    for _ in range(turns):
+        before = len(harness.commands)
+        yield match.message(0)
+        commands = harness.commands[before:]
+        build, deploy = (commands + ["[]", "[]"])[:2]
+        match.apply(0, build, deploy)
+        match.apply(1, *match.mirror(build, deploy))
+        for frame in range(frames):
+            yield match.message(1, frame)
+        match.end_turn()
+    yield match.message(2)
+
+
+def print_report(report):
+    print("{:<14}{:>7}{:>10}{:>10}{:>10}{:>10}{:>10}{:>12}".format("message", "count", "p50 ms", "p90 ms", "p99 ms", "max ms", "blocks", "peak KiB"))
+    for kind, summary in report.items():
+        peak = "{:.1f}".format(summary["peak"] / 1024) if "peak" in summary else "-"
+        print("{:<14}{:>7}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10}{:>12}".format(
+            kind, summary["count"], 1000*summary["p50"], 1000*summary["p90"], 1000*summary["p99"], 1000*summary["max"], summary["blocks"], peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AlgoStrategy on recorded or synthetic games, without the engine")
+    parser.add_argument("--replay", help="A log recorded with ALGO_REPLAY_LOG, a synthetic mirror match is played if omitted")
+    parser.add_argument("--config", default=None, help="Game config for synthetic matches")
+    parser.add_argument("--turns", type=int, default=20, help="Turns in a synthetic match")
+    parser.add_argument("--frames", type=int, default=10, help="Action frames per synthetic turn")
+    parser.add_argument("--allocations", action="store_true", help="Trace peak memory per message with tracemalloc, slows everything down")
+    parser.add_argument("--verbose", action="store_true", help="Let the algo's debug output through")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    harness = Harness(AlgoStrategy(), allocations=args.allocations, verbose=args.verbose)
+    if(args.replay):
+        messages = replayed_messages(args.replay)
+    else:
+        config = load_config(args.config) if args.config else load_config()
+        messages = synthetic_messages(harness, config, args.turns, args.frames)
+    harness.run(messages)
+
+    report = harness.report()
+    print_report(report)
+    print("{} commands sent".format(len(harness.commands)))
+    if(args.json):
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
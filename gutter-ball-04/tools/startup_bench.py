@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gamelib.util import BANNER_TEXT
+from synthetic import SyntheticMatch, load_config
+from timing import latency_summary
+
+"""
+Times how long a fresh algo process takes to get going, as the engine sees it:
+
+    banner      process start until the banner is printed, i.e. interpreter start-up and imports
+    config      sending the config until the first turn's commands come back, so on_game_start
+                plus turn 0. The config is sent --gap seconds after the banner, as the engine
+                takes a while to send it, which AlgoCore.warm_up makes use of
+    first_turn  process start until the first turn's commands come back
+
+    python tools/startup_bench.py --runs 10 --gap 0.5
+    python tools/startup_bench.py --banner-only --json startup.json
+"""
+
+RUN_SH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run.sh")
+
+
+def _pump(stream, events, name):
+    for line in stream:
+        events.put((time.perf_counter(), name, line.rstrip("\n")))
+    events.put((time.perf_counter(), name, None))
+
+
+def _wait_for(events, name, test, deadline):
+    while True:
+        try:
+            arrived, source, line = events.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            raise RuntimeError("timed out waiting for the algo's {}".format(name))
+        if(line is None and source == name):
+            raise RuntimeError("algo exited before its {} arrived".format(name))
+        if(source == name and line is not None and test(line)):
+            return arrived
+
+
+def run_once(command, config, banner_only=False, gap=0.0, timeout=30.0):
+    """
+    Starts one algo process and returns its {banner, config, first_turn} times in seconds,
+    banner only if banner_only.
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True, bufsize=1)
+    events = queue.Queue()
+    for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+        threading.Thread(target=_pump, args=(stream, events, name), daemon=True).start()
+    deadline = started + timeout
+    try:
+        banner = _wait_for(events, "stderr", lambda line: BANNER_TEXT in line, deadline)
+        times = {"banner": banner - started}
+        if(banner_only):
+            return times
+        time.sleep(gap)
+        sent = time.perf_counter()
+        match = SyntheticMatch(config)
+        process.stdin.write(json.dumps(config) + "\n" + match.message(0) + "\n")
+        process.stdin.flush()
+        _wait_for(events, "stdout", lambda line: True, deadline)
+        answered = _wait_for(events, "stdout", lambda line: True, deadline)
+        times["config"] = answered - sent
+        times["first_turn"] = answered - started
+        process.stdin.write(match.message(2) + "\n")
+        process.stdin.flush()
+        return times
+    finally:
+        try:
+            process.stdin.close()
+            process.wait(5.0)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the algo's start-up, from process start to the banner and to its first turn")
+    parser.add_argument("--command", default="bash " + RUN_SH, help="How to start an algo, run.sh by default")
+    parser.add_argument("--config", default=None, help="Game config to send, tools/game_config.json by default")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to time")
+    parser.add_argument("--banner-only", action="store_true", help="Stop each run at the banner, without sending the config")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds between the banner and sending the config")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for each run")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    config = load_config(args.config) if args.config else load_config()
+    runs = [run_once(args.command.split(), config, args.banner_only, args.gap, args.timeout + args.gap) for _ in range(args.runs)]
+    results = {}
+    for name in ("banner", "config", "first_turn"):
+        times = [run[name] for run in runs if name in run]
+        if(times):
+            results[name] = latency_summary(times)
+            print("{:<11} p50 {:>8.1f} ms  p90 {:>8.1f} ms  max {:>8.1f} ms".format(
+                name, 1000*results[name]["p50"], 1000*results[name]["p90"], 1000*results[name]["max"]))
+    if(args.json):
+        with open(args.json, "w") as out:
+            json.dump({"runs": args.runs, "results": results}, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import json
+import os
+
+"""
+Just enough of the engine's bookkeeping to produce believable message streams offline:
+structures persist between turns, builds and upgrades cost SP, deploys cost MP and
+resources grow on the engine's schedule. There is no action phase, so nothing is ever
+destroyed and deployed mobile units only appear at their spawn tiles in the frames.
+"""
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_config.json")
+
+# Index of each entry in the p1Units/p2Units lists, following config["unitInformation"]
+WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE = range(8)
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path) as config_file:
+        return json.load(config_file)
+
+
+class SyntheticMatch(object):
+    """
+    Two players on one board. Player 0 is the algo under test, player 1 mirrors it unless
+    given its own commands. Feed each turn's two command lines back with apply().
+    """
+    def __init__(self, config):
+        self.config = config
+        self.turn = 0
+        self.health = [config["resources"]["startingHP"]]*2
+        self.resources = [[config["resources"]["startingCores"], config["resources"]["startingBits"]] for _ in range(2)]
+        self.shorthand = [unit["shorthand"] for unit in config["unitInformation"]]
+        self.index = {shorthand: i for i, shorthand in enumerate(self.shorthand)}
+        self.structures = [{}, {}]
+        self.removing = [set(), set()]
+        self.mobile = [[], []]
+        self._next_id = 0
+
+    def _unit_id(self):
+        self._next_id += 1
+        return str(self._next_id)
+
+    def _cost(self, index, upgrade=False):
+        unit = self.config["unitInformation"][index]
+        cost = [unit.get("cost1", 0), unit.get("cost2", 0)]
+        if upgrade:
+            cost = [unit.get("upgrade", {}).get("cost1", cost[0]), unit.get("upgrade", {}).get("cost2", cost[1])]
+        return cost
+
+    def _own_half(self, player, y):
+        return y < 14 if player == 0 else y >= 14
+
+    def _afford(self, player, cost):
+        sp, mp = self.resources[player]
+        if(sp < cost[0] or mp < cost[1]):
+            return False
+        self.resources[player] = [sp - cost[0], mp - cost[1]]
+        return True
+
+    def apply(self, player, build_string, deploy_string):
+        """
+        Applies one player's two command lines, skipping anything the engine would reject.
+        """
+        for shorthand, x, y in json.loads(build_string):
+            index = self.index.get(shorthand)
+            if(index is None or not self._own_half(player, y)):
+                continue
+            existing = self.structures[player].get((x, y))
+            if(index == REMOVE):
+                if(existing is not None):
+                    self.removing[player].add((x, y))
+            elif(index == UPGRADE):
+                if(existing is not None and not existing[2] and self._afford(player, self._cost(existing[0], True))):
+                    upgrade = self.config["unitInformation"][existing[0]].get("upgrade", {})
+                    existing[1] = upgrade.get("startHealth", existing[1])
+                    existing[2] = True
+            elif(existing is None and index < SCOUT and self._afford(player, self._cost(index))):
+                self.structures[player][(x, y)] = [index, self.config["unitInformation"][index]["startHealth"], False, self._unit_id()]
+        for shorthand, x, y in json.loads(deploy_string):
+            index = self.index.get(shorthand)
+            if(index is not None and SCOUT <= index <= INTERCEPTOR and self._afford(player, self._cost(index))):
+                self.mobile[player].append([index, x, y, self._unit_id()])
+
+    def mirror(self, build_string, deploy_string):
+        """
+        Player 0's commands flipped onto player 1's half, for a mirror match.
+        """
+        flip = lambda commands: json.dumps([[shorthand, x, 27 - y] for shorthand, x, y in json.loads(commands)])
+        return flip(build_string), flip(deploy_string)
+
+    def _units(self, player, with_mobile):
+        units = [[] for _ in range(8)]
+        for (x, y), (index, health, upgraded, unit_id) in sorted(self.structures[player].items()):
+            units[index].append([x, y, health, unit_id])
+            if(upgraded):
+                units[UPGRADE].append([x, y, health, unit_id])
+            if((x, y) in self.removing[player]):
+                units[REMOVE].append([x, y, health, unit_id])
+        if(with_mobile):
+            for index, x, y, unit_id in self.mobile[player]:
+                units[index].append([x, y, self.config["unitInformation"][index]["startHealth"], unit_id])
+        return units
+
+    def message(self, turn_type=0, frame=-1):
+        """
+        A serialized game state: turn_type 0 is a turn, 1 an action frame and 2 the end of the game.
+        """
+        with_mobile = turn_type == 1
+        state = {
+            "p1Units": self._units(0, with_mobile),
+            "p2Units": self._units(1, with_mobile),
+            "turnInfo": [turn_type, self.turn, frame, 0],
+            "p1Stats": [self.health[0], self.resources[0][0], self.resources[0][1], 0],
+            "p2Stats": [self.health[1], self.resources[1][0], self.resources[1][1], 0],
+            "events": {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [],
+                       "spawn": [], "death": [], "attack": [], "melee": []}
+        }
+        return json.dumps(state)
+
+    def end_turn(self):
+        """
+        Clears the action phase and grants the next turn's resources.
+        """
+        resources = self.config["resources"]
+        for player in (0, 1):
+            for location in self.removing[player]:
+                self.structures[player].pop(location, None)
+            self.removing[player] = set()
+            self.mobile[player] = []
+        self.turn += 1
+        for player in (0, 1):
+            sp, mp = self.resources[player]
+            mp = mp * (1 - resources["bitDecayPerRound"]) + resources["bitsPerRound"] + \
+                resources["bitGrowthRate"] * (self.turn // resources["turnIntervalForBitSchedule"])
+            self.resources[player] = [sp + resources["coresPerRound"], round(mp, 1)]
@@ -0,0 +1,21 @@
+"""
+Latency statistics shared by the benchmarking tools.
+"""
+
+
+def percentile(values, fraction):
+    if(len(values) == 0):
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(times):
+    """
+    count, p50, p90, p99 and max of a list of durations in seconds.
+    """
+    summary = {"count": len(times)}
+    for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        summary[name] = percentile(times, fraction)
+    summary["max"] = max(times) if times else 0.0
+    return summary